@@ -0,0 +1,95 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .file_utils import dedupe_columns
+
+CACHE_NAME = ".columns_cache.json"
+CACHE_VERSION = 2
+
+
+def rel_key(path: Path, paper_root: Path) -> str:
+    try:
+        return Path(path).resolve().relative_to(Path(paper_root).resolve()).as_posix()
+    except ValueError:
+        return Path(path).resolve().as_posix()
+
+
+def _stat(path: Path) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def load_column_cache(paper_root: Path) -> Dict:
+    """
+    {"version": 2, "files": {rel_path: entry}, "columns": [...]}. A legacy
+    cache (a bare column list) loads with no file entries, so every file counts
+    as stale and the next refresh re-reads everything once.
+    """
+    cache_file = Path(paper_root) / CACHE_NAME
+    try:
+        raw = json.loads(cache_file.read_text(encoding="utf-8"))
+    except Exception:
+        return {"version": CACHE_VERSION, "files": {}, "columns": []}
+    files = raw.get("files") if raw.get("version") == CACHE_VERSION else None
+    return {
+        "version": CACHE_VERSION,
+        "files": files if isinstance(files, dict) else {},
+        "columns": raw.get("columns", []),
+    }
+
+
+def is_fresh(entry: Optional[Dict], path: Path) -> bool:
+    """Unchanged since it was read; files that failed are not retried until they change (or force)."""
+    if not entry:
+        return False
+    st = _stat(path)
+    return st is not None and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+
+def stale_report(cache: Dict, data_files: List[Path], paper_root: Path) -> Dict[str, List[str]]:
+    files = cache.get("files", {})
+    current = {rel_key(p, paper_root): p for p in data_files}
+    added = sorted(k for k in current if k not in files)
+    changed = sorted(k for k, p in current.items() if k in files and not is_fresh(files[k], p))
+    removed = sorted(k for k in files if k not in current)
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def make_entry(path: Path, result: Dict) -> Dict:
+    st = _stat(path)
+    return {
+        "size": st.st_size if st else None,
+        "mtime_ns": st.st_mtime_ns if st else None,
+        "columns": result.get("columns", []),
+        "reader": result.get("reader"),
+        "elapsed": round(result.get("elapsed") or 0.0, 4),
+        "error": result.get("error"),
+    }
+
+
+def merged_columns(files: Dict[str, Dict], max_columns: int = 5000) -> List[str]:
+    return dedupe_columns([c for key in sorted(files) for c in files[key].get("columns", [])], max_columns)
+
+
+def column_sources(files: Dict[str, Dict]) -> Dict[str, List[str]]:
+    sources: Dict[str, List[str]] = {}
+    for key in sorted(files):
+        for col in files[key].get("columns", []):
+            sources.setdefault(col, []).append(key)
+    return sources
+
+
+def save_column_cache(paper_root: Path, files: Dict[str, Dict]) -> Dict:
+    cache = {"version": CACHE_VERSION, "files": files, "columns": merged_columns(files)}
+    target = Path(paper_root) / CACHE_NAME
+    tmp = target.with_name(f"{CACHE_NAME}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, target)
+    except OSError:
+        pass
+    return cache
@@ -0,0 +1,246 @@
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Formats that cannot be read lazily (pickle, and R files whose objects have no
+# listable columns) are only deserialised below this size. None disables the limit.
+DEFAULT_MAX_FULL_READ_BYTES: Optional[int] = 256 * 1024 * 1024
+
+
+class ColumnReadSkipped(Exception):
+    """The file would have to be loaded in full and exceeds the size threshold."""
+
+
+def _check_full_read(path: Path, max_full_read_bytes: Optional[int]) -> None:
+    if max_full_read_bytes is None:
+        return
+    size = os.path.getsize(path)
+    if size > max_full_read_bytes:
+        raise ColumnReadSkipped(f"{path.name}: {size} bytes exceeds full-read limit {max_full_read_bytes}")
+
+
+def _frame_columns(obj) -> List[str]:
+    cols: List[str] = []
+    if hasattr(obj, "columns"):
+        try:
+            cols.extend(obj.columns.tolist())
+        except Exception:
+            pass
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            if hasattr(v, "columns"):
+                try:
+                    cols.extend(v.columns.tolist())
+                except Exception:
+                    pass
+    return cols
+
+
+def _parquet_columns(path: Path) -> List[str]:
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(path)
+    names = list(schema.names)
+    # pandas stores its index as extra columns; read_parquet would restore them as the index
+    meta = schema.pandas_metadata or {}
+    index_cols = {c for c in meta.get("index_columns", []) if isinstance(c, str)}
+    return [n for n in names if n not in index_cols]
+
+
+def _feather_columns(path: Path) -> List[str]:
+    import pyarrow as pa
+
+    try:
+        # Feather v2 is the Arrow IPC file format: the schema sits in the footer
+        with pa.memory_map(str(path), "r") as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    except pa.ArrowInvalid:
+        import pyarrow.feather as feather
+
+        # Feather v1: memory-mapped, so only the touched pages are paged in
+        return list(feather.read_table(str(path), memory_map=True).schema.names)
+
+
+def _readstat_columns(path: Path, ext: str) -> List[str]:
+    import pyreadstat
+
+    reader = {".dta": pyreadstat.read_dta, ".sav": pyreadstat.read_sav, ".sas7bdat": pyreadstat.read_sas7bdat}[ext]
+    _, meta = reader(str(path), metadataonly=True)
+    return list(meta.column_names)
+
+
+def _r_columns(path: Path, max_full_read_bytes: Optional[int]) -> Tuple[List[str], str]:
+    import pyreadr
+
+    try:
+        objects = pyreadr.list_objects(str(path))
+    except Exception:
+        objects = []
+    cols: List[str] = []
+    for obj in objects:
+        cols.extend(obj.get("columns") or [])
+    if cols:
+        return cols, "pyreadr.list_objects"
+    _check_full_read(path, max_full_read_bytes)
+    res = pyreadr.read_r(str(path))
+    for _, df in res.items():
+        cols.extend(_frame_columns(df))
+    return cols, "pyreadr.read_r"
+
+
+def _pickle_columns(path: Path, max_full_read_bytes: Optional[int]) -> List[str]:
+    import pickle
+
+    _check_full_read(path, max_full_read_bytes)
+    with path.open("rb") as f:
+        obj = pickle.load(f)
+    return _frame_columns(obj)
+
+
+def read_columns(
+    path: Path,
+    max_sheets: Optional[int] = None,
+    max_full_read_bytes: Optional[int] = DEFAULT_MAX_FULL_READ_BYTES,
+) -> Tuple[List[str], str]:
+    """
+    Column names of one data file without loading its rows where the format
+    allows it. Returns (columns, reader name). Raises on unreadable files and
+    ColumnReadSkipped when only a full load is possible and the file is too big.
+    """
+    path = Path(path)
+    ext = path.suffix.lower()
+    if ext in {".csv", ".tsv"}:
+        import pandas as pd
+
+        df = pd.read_csv(path, nrows=0, sep="," if ext == ".csv" else "\t")
+        cols, reader = df.columns.tolist(), "pandas.read_csv(nrows=0)"
+    elif ext in {".xlsx", ".xls"}:
+        import pandas as pd
+
+        cols = []
+        with pd.ExcelFile(path) as xls:
+            sheets = xls.sheet_names if max_sheets is None else xls.sheet_names[:max_sheets]
+            for sheet in sheets:
+                cols.extend(xls.parse(sheet, nrows=0).columns.tolist())
+        reader = "pandas.ExcelFile(nrows=0)"
+    elif ext in {".dta", ".sav", ".sas7bdat"}:
+        cols, reader = _readstat_columns(path, ext), "pyreadstat(metadataonly)"
+    elif ext in {".rds", ".rdata"}:
+        cols, reader = _r_columns(path, max_full_read_bytes)
+    elif ext == ".parquet":
+        cols, reader = _parquet_columns(path), "pyarrow.parquet.read_schema"
+    elif ext == ".feather":
+        cols, reader = _feather_columns(path), "pyarrow.ipc schema"
+    elif ext == ".pkl":
+        cols, reader = _pickle_columns(path, max_full_read_bytes), "pickle.load"
+    else:
+        cols, reader = [], "unsupported"
+    return [str(c) for c in cols], reader
+
+
+_started = None
+
+
+def _init_worker(started) -> None:
+    global _started
+    _started = started
+    # import the heavy readers up front so their import time does not count against a file's timeout
+    import pandas  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+
+
+def _worker_ready(_: int) -> bool:
+    return True
+
+
+def _read_columns_task(index: int, path: str, max_full_read_bytes: Optional[int]) -> dict:
+    # tell the parent this file is now running, so its timeout counts from here
+    _started.put(index)
+    start = time.perf_counter()
+    try:
+        cols, reader = read_columns(Path(path), max_full_read_bytes=max_full_read_bytes)
+        return {"columns": cols, "reader": reader, "error": None, "elapsed": time.perf_counter() - start}
+    except Exception as e:
+        return {"columns": [], "reader": None, "error": f"{type(e).__name__}: {e}", "elapsed": time.perf_counter() - start}
+
+
+def read_columns_parallel(
+    paths: List[Path],
+    workers: int = 4,
+    file_timeout: float = 60.0,
+    max_full_read_bytes: Optional[int] = DEFAULT_MAX_FULL_READ_BYTES,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[dict]:
+    """
+    Read columns of many files on a process pool; one result dict per path, in
+    input order (columns, reader, error, elapsed).
+
+    At most one file per worker is in flight, and each file's `file_timeout`
+    counts from the moment a worker starts it. A file that overruns gets a
+    strike and its worker is written off; the other workers keep going. Once
+    nothing is left to run the pool is terminated (killing the stuck workers)
+    and files with one strike are retried on a fresh pool; a file that times
+    out twice is reported as an error.
+    """
+    results: Dict[int, dict] = {}
+    strikes: Dict[int, int] = {}
+    pending = list(range(len(paths)))
+    ctx = multiprocessing.get_context("spawn")
+    while pending:
+        todo = list(pending)
+        retry: List[int] = []
+        processes = max(1, min(workers, len(todo)))
+        started = ctx.Queue()
+        pool = ctx.Pool(processes=processes, initializer=_init_worker, initargs=(started,))
+        try:
+            pool.map(_worker_ready, range(processes), chunksize=1)
+            running: Dict[int, "multiprocessing.pool.AsyncResult"] = {}
+            start_times: Dict[int, float] = {}
+            stuck = 0
+            while todo or running:
+                while todo and len(running) < processes - stuck:
+                    i = todo.pop(0)
+                    running[i] = pool.apply_async(_read_columns_task, (i, str(paths[i]), max_full_read_bytes))
+                if not running:
+                    # every worker is stuck; the rest go to a fresh pool
+                    break
+                try:
+                    start_times[started.get(timeout=0.05)] = time.monotonic()
+                    while True:
+                        start_times[started.get_nowait()] = time.monotonic()
+                except queue.Empty:
+                    pass
+                now = time.monotonic()
+                for i, handle in list(running.items()):
+                    if handle.ready():
+                        del running[i]
+                        try:
+                            results[i] = handle.get()
+                        except Exception as e:
+                            results[i] = {"columns": [], "reader": None, "error": f"{type(e).__name__}: {e}", "elapsed": 0.0}
+                    elif i in start_times and now - start_times[i] > file_timeout:
+                        del running[i]
+                        stuck += 1
+                        strikes[i] = strikes.get(i, 0) + 1
+                        if strikes[i] < 2:
+                            retry.append(i)
+                            continue
+                        results[i] = {
+                            "columns": [],
+                            "reader": None,
+                            "error": f"timed out after {file_timeout:g}s",
+                            "elapsed": now - start_times[i],
+                        }
+                    else:
+                        continue
+                    if progress:
+                        progress(len(results), len(paths))
+            retry.extend(todo)
+        finally:
+            pool.terminate()
+            pool.join()
+        pending = retry
+    return [results[i] for i in range(len(paths))]
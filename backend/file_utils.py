@@ -1,13 +1,16 @@
 import csv
+import io
 import json
+import os
 import re
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from .column_readers import DEFAULT_MAX_FULL_READ_BYTES, read_columns
 from .models import GridData, NoteCollection, SkeletonModel, TableInfo, XRow, YColumn
-DATA_EXTS = {".csv", ".tsv", ".dta", ".sav", ".sas7bdat", ".rds", ".rdata", ".feather", ".parquet", ".xlsx", ".xls", ".pkl"}
-DOC_EXTS = {".pdf", ".md", ".txt"}
+from .status_manifest import read_statuses, record_status
 
 
 def parse_table_filename(filename: str) -> Optional[Tuple[str, str]]:
@@ -25,16 +28,22 @@ def parse_table_filename(filename: str) -> Optional[Tuple[str, str]]:
     return match.group("paper_id"), match.group("table_id")
 
 
-def find_image_path(directory: Path, base_prefix: str) -> Optional[Path]:
+def _exists(directory: Path, name: str, names: Optional[Set[str]]) -> bool:
+    # When the caller already listed the directory, avoid a stat per candidate.
+    if names is not None:
+        return name in names
+    return (directory / name).exists()
+
+
+def find_image_path(directory: Path, base_prefix: str, names: Optional[Set[str]] = None) -> Optional[Path]:
     """
     Try exact match; if not found and table has panel suffix (e.g., table1_A),
     fall back to base without panel, and a _wp image if present.
     """
     def try_candidate(prefix: str) -> Optional[Path]:
         for ext in (".png", ".jpg", ".jpeg"):
-            candidate = directory / f"{prefix}{ext}"
-            if candidate.exists():
-                return candidate
+            if _exists(directory, f"{prefix}{ext}", names):
+                return directory / f"{prefix}{ext}"
         return None
 
     img = try_candidate(base_prefix)
@@ -54,13 +63,10 @@ def find_image_path(directory: Path, base_prefix: str) -> Optional[Path]:
     return None
 
 
-def find_skeleton_path(directory: Path, base_prefix: str) -> Optional[Path]:
-    preferred = directory / f"{base_prefix}.skeleton.json"
-    if preferred.exists():
-        return preferred
-    fallback = directory / f"{base_prefix}.json"
-    if fallback.exists():
-        return fallback
+def find_skeleton_path(directory: Path, base_prefix: str, names: Optional[Set[str]] = None) -> Optional[Path]:
+    for name in (f"{base_prefix}.skeleton.json", f"{base_prefix}.json"):
+        if _exists(directory, name, names):
+            return directory / name
     return None
 
 
@@ -72,37 +78,70 @@ def safe_relative(path: Path, root_dir: Path) -> bool:
         return False
 
 
+def build_table_info(
+    csv_path: Path,
+    names: Optional[Set[str]] = None,
+    statuses: Optional[Dict[str, Optional[str]]] = None,
+) -> Optional[TableInfo]:
+    parsed = parse_table_filename(csv_path.name)
+    if not parsed:
+        return None
+    paper_id, table_id = parsed
+    base_prefix = f"{paper_id}_{table_id}"
+    image_path = find_image_path(csv_path.parent, base_prefix, names)
+    skeleton_path = find_skeleton_path(csv_path.parent, base_prefix, names)
+    status = "not_started"
+    if skeleton_path:
+        if statuses is not None and skeleton_path.name in statuses:
+            status = statuses[skeleton_path.name] or "in_progress"
+        else:
+            status = read_skeleton_status(skeleton_path) or "in_progress"
+    return TableInfo(
+        paper_id=paper_id,
+        table_id=table_id,
+        csv_path=csv_path,
+        image_path=image_path,
+        skeleton_path=skeleton_path,
+        status=status,
+    )
+
+
+def dir_statuses(
+    directory: Path, csv_names: Iterable[str], names: Set[str], write: bool = True
+) -> Dict[str, Optional[str]]:
+    """Statuses of the skeletons belonging to `csv_names` in one listed directory, in one manifest pass."""
+    skeleton_names = []
+    for name in csv_names:
+        parsed = parse_table_filename(name)
+        if parsed:
+            skeleton = find_skeleton_path(directory, f"{parsed[0]}_{parsed[1]}", names)
+            if skeleton:
+                skeleton_names.append(skeleton.name)
+    return read_statuses(directory, skeleton_names, write=write) if skeleton_names else {}
+
+
 def scan_tables(root_dir: Path) -> List[TableInfo]:
+    """Every table under root_dir; read-only (the status manifests are consulted, not updated)."""
     root = Path(root_dir)
-    tables: Dict[Tuple[str, str], TableInfo] = {}
+    by_dir: Dict[Path, List[str]] = {}
     for csv_path in root.rglob("*.csv"):
-        parsed = parse_table_filename(csv_path.name)
-        if not parsed:
+        by_dir.setdefault(csv_path.parent, []).append(csv_path.name)
+    tables: Dict[Tuple[str, str], TableInfo] = {}
+    for directory, csv_names in by_dir.items():
+        try:
+            names = set(os.listdir(directory))
+        except OSError:
             continue
-        paper_id, table_id = parsed
-        base_prefix = f"{paper_id}_{table_id}"
-        image_path = find_image_path(csv_path.parent, base_prefix)
-        skeleton_path = find_skeleton_path(csv_path.parent, base_prefix)
-        status = "not_started"
-        if skeleton_path:
-            status = read_skeleton_status(skeleton_path) or "in_progress"
-        tables[(paper_id, table_id)] = TableInfo(
-            paper_id=paper_id,
-            table_id=table_id,
-            csv_path=csv_path,
-            image_path=image_path,
-            skeleton_path=skeleton_path,
-            status=status,
-        )
+        statuses = dir_statuses(directory, csv_names, names, write=False)
+        for name in sorted(csv_names):
+            info = build_table_info(directory / name, names, statuses)
+            if info:
+                tables[(info.paper_id, info.table_id)] = info
     return sorted(tables.values(), key=lambda t: (t.paper_id, t.table_id))
 
 
 def read_skeleton_status(path: Path) -> Optional[str]:
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        return data.get("status")
-    except Exception:
-        return None
+    return read_statuses(path.parent, [path.name]).get(path.name)
 
 
 def locate_csv(root_dir: Path, paper_id: str, table_id: str) -> Optional[Path]:
@@ -141,53 +180,24 @@ def read_csv_grid(path: Path) -> GridData:
     return GridData(header=header, rows=rows)
 
 
-def collect_columns(paths: List[Path], max_columns: int = 5000) -> List[str]:
+def collect_columns(
+    paths: List[Path],
+    max_columns: int = 5000,
+    max_full_read_bytes: Optional[int] = DEFAULT_MAX_FULL_READ_BYTES,
+) -> List[str]:
     cols: List[str] = []
     for p in paths:
         if len(cols) >= max_columns:
             break
-        ext = p.suffix.lower()
         try:
-            if ext in {".csv", ".tsv"}:
-                import pandas as pd
-
-                df = pd.read_csv(p, nrows=0, sep="," if ext == ".csv" else "\t")
-                cols.extend(df.columns.tolist())
-            elif ext in {".xlsx", ".xls"}:
-                import pandas as pd
-
-                xls = pd.ExcelFile(p)
-                for sheet in xls.sheet_names:
-                    df = xls.parse(sheet, nrows=0)
-                    cols.extend(df.columns.tolist())
-            elif ext in {".dta", ".sav", ".sas7bdat"}:
-                import pyreadstat
-
-                meta = pyreadstat.read_filemeta(str(p))
-                cols.extend(meta.column_names)
-            elif ext in {".rds", ".rdata"}:
-                import pyreadr
-
-                res = pyreadr.read_r(str(p))
-                for _, df in res.items():
-                    try:
-                        cols.extend(df.columns.tolist())
-                    except Exception:
-                        pass
-            elif ext in {".feather", ".parquet"}:
-                import pandas as pd
-
-                df = pd.read_feather(p, columns=None) if ext == ".feather" else pd.read_parquet(p, columns=None)
-                cols.extend(df.columns.tolist())
-            elif ext == ".pkl":
-                import pickle
-
-                with p.open("rb") as f:
-                    obj = pickle.load(f)
-                if hasattr(obj, "columns"):
-                    cols.extend(getattr(obj, "columns").tolist())
+            file_cols, _ = read_columns(p, max_full_read_bytes=max_full_read_bytes)
         except Exception:
             continue
+        cols.extend(file_cols)
+    return dedupe_columns(cols, max_columns)
+
+
+def dedupe_columns(cols: List[str], max_columns: int = 5000) -> List[str]:
     seen = set()
     dedup: List[str] = []
     for c in cols:
@@ -199,12 +209,65 @@ def collect_columns(paths: List[Path], max_columns: int = 5000) -> List[str]:
     return dedup
 
 
+_table_locks: Dict[str, threading.RLock] = {}
+_table_locks_guard = threading.Lock()
+
+
+def table_lock(path: Path) -> threading.RLock:
+    """One lock per table file (keyed by its resolved path) to serialise read-modify-write saves."""
+    key = str(Path(path).resolve())
+    with _table_locks_guard:
+        lock = _table_locks.get(key)
+        if lock is None:
+            lock = threading.RLock()
+            _table_locks[key] = lock
+        return lock
+
+
+def file_version(path: Path) -> Optional[str]:
+    """Opaque version token of a file ("<mtime_ns>-<size>"), None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def atomic_write_text(path: Path, text: str, fsync: bool = True) -> None:
+    """
+    Write to a temp file in the same directory and rename it over `path`, so
+    readers see either the old or the new content, never a truncated file.
+    With fsync the data (and, on POSIX, the rename) is on disk on return.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync and os.name == "posix":
+        fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def csv_text(rows: List[List[str]]) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
 def write_csv_grid(path: Path, grid: GridData) -> None:
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(grid.header)
-        for row in grid.rows:
-            writer.writerow(row)
+    atomic_write_text(path, csv_text([grid.header, *grid.rows]))
 
 
 def default_skeleton(paper_id: str, table_id: str, csv_path: Path, image_path: Optional[Path]) -> SkeletonModel:
@@ -235,27 +298,38 @@ def load_skeleton(csv_path: Path) -> SkeletonModel:
     image_path = locate_image(csv_path)
     skeleton_path = locate_skeleton(csv_path)
     if skeleton_path and skeleton_path.exists():
-        raw = json.loads(skeleton_path.read_text(encoding="utf-8"))
-        # normalize old notes format that used lists instead of dicts
-        notes = raw.get("notes")
-        if isinstance(notes, dict):
-            for key in ("rows", "cols", "cells"):
-                if isinstance(notes.get(key), list):
-                    notes[key] = {}
-        raw["notes"] = notes or {}
-        data = raw
-        return SkeletonModel(**data)
+        return parse_skeleton_file(skeleton_path)
     return default_skeleton(paper_id, table_id, csv_path, image_path)
 
 
-def save_skeleton(csv_path: Path, skeleton: SkeletonModel) -> Path:
+def parse_skeleton_file(skeleton_path: Path) -> SkeletonModel:
+    return parse_skeleton_text(skeleton_path.read_text(encoding="utf-8"))
+
+
+def parse_skeleton_text(text: str) -> SkeletonModel:
+    raw = json.loads(text)
+    # normalize old notes format that used lists instead of dicts
+    notes = raw.get("notes")
+    if isinstance(notes, dict):
+        for key in ("rows", "cols", "cells"):
+            if isinstance(notes.get(key), list):
+                notes[key] = {}
+    raw["notes"] = notes or {}
+    return SkeletonModel(**raw)
+
+
+def skeleton_save_path(csv_path: Path) -> Path:
     parsed = parse_table_filename(csv_path.name)
     if not parsed:
         raise ValueError("Cannot infer file prefix for skeleton save")
     paper_id, table_id = parsed
-    base_prefix = f"{paper_id}_{table_id}"
-    target = csv_path.parent / f"{base_prefix}.skeleton.json"
+    return csv_path.parent / f"{paper_id}_{table_id}.skeleton.json"
+
+
+def save_skeleton(csv_path: Path, skeleton: SkeletonModel) -> Path:
+    target = skeleton_save_path(csv_path)
     skeleton.last_modified = datetime.utcnow()
     content = json.dumps(json.loads(skeleton.json()), ensure_ascii=False, indent=2)
-    target.write_text(content, encoding="utf-8")
+    atomic_write_text(target, content)
+    record_status(target, skeleton.status)
     return target
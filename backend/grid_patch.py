@@ -0,0 +1,63 @@
+from typing import List
+
+from .models import GridData, GridOp
+
+
+class GridPatchError(ValueError):
+    """An operation does not fit the grid (missing field or index out of range)."""
+
+
+def _index(value, upper: int, what: str) -> int:
+    if value is None or not 0 <= value < upper:
+        raise GridPatchError(f"{what} {value} out of range 0..{upper - 1}")
+    return value
+
+
+def _insert_at(value, upper: int, what: str) -> int:
+    if value is None or not 0 <= value <= upper:
+        raise GridPatchError(f"{what} {value} out of range 0..{upper}")
+    return value
+
+
+def apply_grid_ops(grid: GridData, ops: List[GridOp]) -> GridData:
+    """Apply ops in order to a copy of `grid`; the input is left untouched."""
+    header = list(grid.header)
+    rows = [list(r) for r in grid.rows]
+    for i, op in enumerate(ops):
+        try:
+            width = max([len(header), *(len(r) for r in rows)])
+            if op.op == "set_cell":
+                r = _index(op.row, len(rows), "row")
+                c = _index(op.col, width, "col")
+                row = rows[r]
+                if c >= len(row):
+                    row.extend([""] * (c + 1 - len(row)))
+                row[c] = op.value or ""
+            elif op.op == "set_header":
+                if op.values is None:
+                    raise GridPatchError("set_header needs values")
+                header = list(op.values)
+            elif op.op == "insert_row":
+                r = _insert_at(op.row, len(rows), "row")
+                rows.insert(r, list(op.values) if op.values is not None else [""] * width)
+            elif op.op == "delete_row":
+                del rows[_index(op.row, len(rows), "row")]
+            elif op.op == "insert_col":
+                c = _insert_at(op.col, width, "col")
+                if op.values is not None and len(op.values) != len(rows):
+                    raise GridPatchError(f"insert_col needs {len(rows)} values, got {len(op.values)}")
+                for k, row in enumerate([header, *rows]):
+                    if len(row) < c:
+                        row.extend([""] * (c - len(row)))
+                    if k == 0:
+                        row.insert(c, op.value or "")
+                    else:
+                        row.insert(c, op.values[k - 1] if op.values is not None else "")
+            elif op.op == "delete_col":
+                c = _index(op.col, width, "col")
+                for row in [header, *rows]:
+                    if c < len(row):
+                        del row[c]
+        except GridPatchError as e:
+            raise GridPatchError(f"op {i} ({op.op}): {e}") from None
+    return GridData(header=header, rows=rows)
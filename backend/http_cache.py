@@ -0,0 +1,80 @@
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+
+# The browser keeps the response but asks again every time; a 304 costs one stat.
+REVALIDATE = "no-cache"
+
+
+def _weak_etag(raw: str) -> str:
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_for(*parts: object) -> str:
+    """Weak validator for anything that has its own version markers (e.g. a database row)."""
+    return _weak_etag("|".join(str(p) for p in parts))
+
+
+def file_etag(path: Path, *variant: object) -> str:
+    """Weak validator from size + mtime_ns (+ the derivative parameters), no content hashing."""
+    st = os.stat(path)
+    return _weak_etag("|".join(str(p) for p in (st.st_size, st.st_mtime_ns, *variant)))
+
+
+def paths_etag(paths: Iterable[Optional[Path]], *extra: object) -> Tuple[str, Optional[float]]:
+    """
+    Validator for a response built from several files: path, size and mtime_ns
+    of each (missing files count too, so creating one changes the tag).
+    Returns (etag, newest mtime).
+    """
+    parts: List[str] = [str(e) for e in extra]
+    newest: Optional[float] = None
+    for p in paths:
+        if p is None:
+            parts.append("-")
+            continue
+        try:
+            st = os.stat(p)
+        except OSError:
+            parts.append(f"{p}|-")
+            continue
+        parts.append(f"{p}|{st.st_size}|{st.st_mtime_ns}")
+        newest = st.st_mtime if newest is None else max(newest, st.st_mtime)
+    return _weak_etag("\n".join(parts)), newest
+
+
+def http_date(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+
+def _etags(header: str) -> Iterable[str]:
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag:
+            yield tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, mtime: Optional[float] = None) -> bool:
+    """If-None-Match wins over If-Modified-Since, as in RFC 9110."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        bare = etag[2:] if etag.startswith("W/") else etag
+        return inm.strip() == "*" or bare in set(_etags(inm))
+    ims = request.headers.get("if-modified-since")
+    if ims and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(etag: str, mtime: Optional[float] = None, cache_control: str = REVALIDATE) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if mtime is not None:
+        headers["Last-Modified"] = http_date(mtime)
+    return headers
@@ -0,0 +1,257 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+FORMATS = {"png": ("PNG", ".png", "image/png"), "webp": ("WEBP", ".webp", "image/webp"), "jpeg": ("JPEG", ".jpg", "image/jpeg")}
+MEDIA_TYPES = {ext: media for _, ext, media in FORMATS.values()}
+
+
+def default_cache_dir() -> Path:
+    return Path(tempfile.gettempdir()) / "econ_table_annotator_images"
+
+
+class ImageDerivativeCache:
+    """
+    Downscaled / re-encoded copies of table images, generated on first request
+    and kept on disk. The file name is derived from the source path, size,
+    mtime and the requested variant, so an edited image gets new derivatives
+    and the old ones age out through `prune`.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = 512 * 1024 * 1024, quality: int = 80) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _key(self, src: Path, width: Optional[int], fmt: str) -> str:
+        st = os.stat(src)
+        raw = f"{src.resolve()}|{st.st_size}|{st.st_mtime_ns}|{width}|{fmt}|{self.quality}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def derivative(self, src: Path, width: Optional[int] = None, fmt: Optional[str] = None) -> Path:
+        """
+        Path of `src` scaled down to at most `width` pixels wide and encoded as
+        `fmt` (png / webp / jpeg; default: the source format). Images are never
+        upscaled. Returns `src` itself when nothing would change or Pillow is
+        not installed.
+        """
+        src = Path(src)
+        fmt = fmt or ("jpeg" if src.suffix.lower() in {".jpg", ".jpeg"} else "png")
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported format: {fmt}")
+        same_format = FORMATS[fmt][1] == (".jpg" if src.suffix.lower() == ".jpeg" else src.suffix.lower())
+        if width is None and same_format:
+            return src
+        try:
+            from PIL import Image
+        except ImportError:
+            return src
+
+        key = self._key(src, width, fmt)
+        target = self.cache_dir / key[:2] / f"{key}{FORMATS[fmt][1]}"
+        if target.exists():
+            return target
+
+        with Image.open(src) as im:
+            if width is not None and im.width > width:
+                height = max(1, round(im.height * width / im.width))
+                im = im.resize((width, height), Image.LANCZOS)
+            elif same_format:
+                return src
+            if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            im.save(tmp, format=FORMATS[fmt][0], quality=self.quality, optimize=True)
+        os.replace(tmp, target)
+        self._maybe_prune()
+        return target
+
+    def _maybe_prune(self) -> None:
+        with self._lock:
+            self._writes += 1
+            if self._writes % 50:
+                return
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete least recently used derivatives until the cache fits max_bytes; returns files removed."""
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob("*/*"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, p))
+            total += st.st_size
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def _flatten(im, grayscale: bool = True):
+    """Copy of im on a white background, as L (grayscale) or RGB."""
+    from PIL import Image
+
+    if im.mode in ("RGBA", "LA", "P", "PA"):
+        im = im.convert("RGBA")
+        background = Image.new("RGBA", im.size, (255, 255, 255, 255))
+        im = Image.alpha_composite(background, im)
+    return im.convert("L" if grayscale else "RGB")
+
+
+def trim_margins(im, threshold: int = 245, pad: int = 8):
+    """Crop uniform light margins, keeping `pad` pixels around the content."""
+    gray = im if im.mode == "L" else im.convert("L")
+    bbox = gray.point(lambda p: 255 if p < threshold else 0).getbbox()
+    if bbox is None:
+        return im
+    left, top, right, bottom = bbox
+    box = (max(0, left - pad), max(0, top - pad), min(im.width, right + pad), min(im.height, bottom + pad))
+    return im if box == (0, 0, im.width, im.height) else im.crop(box)
+
+
+class InlineImageEncoder:
+    """
+    Table images prepared for vision requests, as data URLs: margins trimmed,
+    scaled down to at most `max_edge` pixels, reduced to 16 gray levels
+    (plenty for black-on-white text) and encoded as PNG; JPEG when the PNG
+    exceeds `max_bytes`, shrinking further until it fits. The original bytes
+    are sent unchanged when they are already smaller.
+
+    Results are cached by sha256 of the source bytes, in memory and under
+    cache_dir/inline, so the backend and repeated pipeline runs encode each
+    image once.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_edge: int = 2048,
+        max_bytes: int = 1024 * 1024,
+        memory_bytes: int = 32 * 1024 * 1024,
+        grayscale: bool = True,
+    ) -> None:
+        self.cache_dir = (Path(cache_dir) if cache_dir else default_cache_dir()) / "inline"
+        self.max_edge = max_edge
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.grayscale = grayscale
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def data_url(self, data: bytes, name: str = "") -> str:
+        """`name` (a file name) only decides the media type when Pillow is missing."""
+        key = hashlib.sha256(data).hexdigest()
+        key = hashlib.sha1(f"{key}|{self.max_edge}|{self.max_bytes}|{self.grayscale}".encode("utf-8")).hexdigest()
+        with self._lock:
+            url = self._memory.get(key)
+            if url is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return url
+        path = self.cache_dir / key[:2] / f"{key}.txt"
+        try:
+            url = path.read_text(encoding="ascii")
+            with self._lock:
+                self.hits += 1
+        except OSError:
+            url = self._encode(data, name)
+            with self._lock:
+                self.misses += 1
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp.write_text(url, encoding="ascii")
+                os.replace(tmp, path)
+            except OSError:
+                pass
+        self._remember(key, url)
+        return url
+
+    def _remember(self, key: str, url: str) -> None:
+        with self._lock:
+            if key not in self._memory:
+                self._memory_size += len(url)
+            self._memory[key] = url
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_size -= len(old)
+
+    def _encode(self, data: bytes, name: str) -> str:
+        try:
+            out, media = self.prepare(data)
+        except ImportError:
+            ext = Path(name).suffix.lower()
+            out, media = data, MEDIA_TYPES.get(".jpg" if ext == ".jpeg" else ext, "image/png")
+        return f"data:{media};base64,{base64.b64encode(out).decode('ascii')}"
+
+    def prepare(self, data: bytes) -> Tuple[bytes, str]:
+        """(encoded bytes, media type) of the prepared image."""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as src:
+            src_format = (src.format or "").upper()
+            original_size = src.size
+            im = trim_margins(_flatten(src, self.grayscale))
+        scale = min(1.0, self.max_edge / max(im.size))
+        while True:
+            if scale < 1.0:
+                size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+                scaled = im.resize(size, Image.LANCZOS)
+            else:
+                scaled = im
+            buf = io.BytesIO()
+            (scaled.quantize(16) if scaled.mode == "L" else scaled).save(buf, format="PNG", optimize=True)
+            fmt = "png"
+            if buf.tell() > self.max_bytes:
+                buf = io.BytesIO()
+                scaled.save(buf, format="JPEG", quality=85, optimize=True)
+                fmt = "jpeg"
+            if buf.tell() <= self.max_bytes or max(scaled.size) <= 512:
+                break
+            scale *= 0.8
+        out = buf.getvalue()
+        untouched_fits = max(original_size) <= self.max_edge and len(data) <= self.max_bytes
+        if untouched_fits and len(data) <= len(out) and src_format in ("PNG", "JPEG", "WEBP"):
+            return data, f"image/{src_format.lower()}"
+        return out, FORMATS[fmt][2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory), "memory_bytes": self._memory_size}
+
+
+_encoder: Optional[InlineImageEncoder] = None
+_encoder_lock = threading.Lock()
+
+
+def get_inline_encoder(max_edge: Optional[int] = None, max_bytes: Optional[int] = None) -> InlineImageEncoder:
+    """Process-wide encoder; passing a limit reconfigures it."""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None or max_edge is not None or max_bytes is not None:
+            _encoder = InlineImageEncoder(
+                max_edge=2048 if max_edge is None else max_edge,
+                max_bytes=1024 * 1024 if max_bytes is None else max_bytes,
+            )
+        return _encoder
@@ -0,0 +1,92 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: str
+    status: str = "queued"
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """
+    Runs long operations off the request thread. Jobs are kept in memory and
+    polled by id; at most one job per (kind, key) is active at a time, so a
+    second request for the same work returns the running job.
+    """
+
+    def __init__(self, max_workers: int = 2, keep_finished: int = 200) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[tuple, str] = {}
+        self._keep_finished = keep_finished
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, key: str, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """`fn(job, *args, **kwargs)`; its return value becomes `job.result`."""
+        with self._lock:
+            active_id = self._active.get((kind, key))
+            if active_id:
+                return self._jobs[active_id]
+            job = Job(id=uuid.uuid4().hex, kind=kind, key=key)
+            self._jobs[job.id] = job
+            self._active[(kind, key)] = job.id
+            self._prune()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs) -> None:
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+            traceback.print_exc()
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop((job.kind, job.key), None)
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        if len(finished) <= self._keep_finished:
+            return
+        finished.sort(key=lambda j: j.finished)
+        for j in finished[: len(finished) - self._keep_finished]:
+            del self._jobs[j.id]
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class LLMBusy(Exception):
+    """Every LLM slot stayed taken for longer than the queue timeout."""
+
+
+class LLMClientPool:
+    """
+    One AsyncOpenAI client per process, sharing a pooled HTTP connection pool.
+    It is rebuilt only when the api key / base url change (POST /api/config);
+    the replaced client is closed as soon as its last running request ends.
+    At most `max_concurrency` requests are in flight; further callers wait up
+    to `queue_timeout` seconds for a slot and then get LLMBusy, so a burst of
+    auto-fill clicks cannot pile up unbounded.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        timeout: float = 120.0,
+        queue_timeout: float = 30.0,
+        max_connections: int = 20,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._client_key: Optional[Tuple[Optional[str], Optional[str]]] = None
+        self._retired: List[Any] = []
+        # running requests per client (by id), so retired clients are closed once idle
+        self._users: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    def client(self, api_key: Optional[str], base_url: Optional[str]):
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        import httpx
+
+        with self._lock:
+            if self._client is None or self._client_key != (api_key, base_url):
+                if self._client is not None:
+                    # requests already running keep using it; closed when they are done
+                    self._retired.append(self._client)
+                self._client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=self.timeout,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_concurrency,
+                        )
+                    ),
+                )
+                self._client_key = (api_key, base_url)
+            return self._client
+
+    async def chat(self, api_key: Optional[str], base_url: Optional[str], **kwargs) -> Any:
+        """`chat.completions.create(**kwargs)` on the shared client, within the concurrency cap."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusy(f"{self.max_concurrency} LLM requests already running") from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            with self._lock:
+                client = self.client(api_key, base_url)
+                self._users[id(client)] = self._users.get(id(client), 0) + 1
+                idle = self._take_idle()
+            await self._close(idle)
+            try:
+                return await client.chat.completions.create(**kwargs)
+            finally:
+                with self._lock:
+                    self._users[id(client)] -= 1
+                    if not self._users[id(client)]:
+                        del self._users[id(client)]
+                    idle = self._take_idle()
+                await self._close(idle)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _take_idle(self) -> List[Any]:
+        """Remove and return the retired clients no request is using (call with _lock held)."""
+        idle = [c for c in self._retired if id(c) not in self._users]
+        self._retired = [c for c in self._retired if id(c) in self._users]
+        return idle
+
+    @staticmethod
+    async def _close(clients: List[Any]) -> None:
+        for c in clients:
+            try:
+                await c.close()
+            except Exception:
+                pass
+
+    async def aclose(self) -> None:
+        with self._lock:
+            clients = [c for c in [self._client, *self._retired] if c is not None]
+            self._client, self._client_key, self._retired = None, None, []
+        for c in clients:
+            await c.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "client_ready": self._client is not None,
+        }
@@ -0,0 +1,235 @@
+"""
+Content-addressed cache of LLM responses, shared by the backend's
+suggest_grid and the pre_annotator pipeline.
+
+The key is a sha256 over the provider's base url, the model, the sampling
+parameters and the messages (inline images included), so re-running the pipeline after a crash or
+clicking auto-fill again on an unchanged table returns the stored answer
+instead of paying for another request. Only responses the caller managed to
+parse are stored.
+
+    python -m backend.llm_cache stats
+    python -m backend.llm_cache prune --max-mb 100 --older-than-days 30
+    python -m backend.llm_cache clear
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+KEY_VERSION = 2
+
+
+def default_cache_dir() -> Path:
+    base = os.getenv("PRE_ANNOTATOR_CACHE_DIR")
+    return (Path(base) if base else Path.home() / ".cache" / "econ_table_annotator") / "llm_responses"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _canonical_messages(messages: List[Dict[str, Any]]) -> List[Any]:
+    """Messages with image parts reduced to a digest; non-inline image urls (localhost etc.) are left out."""
+    out = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if part.get("type") == "image_url":
+                    url = (part.get("image_url") or {}).get("url") or ""
+                    parts.append({"image": _sha256(url.encode("utf-8")) if url.startswith("data:") else None})
+                else:
+                    parts.append(part)
+            content = parts
+        out.append({"role": msg.get("role"), "content": content})
+    return out
+
+
+def request_key(model: str, messages: List[Dict[str, Any]], base_url: Optional[str] = None, **params: Any) -> str:
+    """
+    Cache key of a chat completion. `base_url` tells providers serving the same
+    model name apart; `params` are the sampling parameters (temperature, ...),
+    not transport options such as timeouts. Callers must build the messages
+    deterministically (no set iteration order) for keys to match across runs.
+    """
+    payload = {
+        "v": KEY_VERSION,
+        "base_url": str(base_url).rstrip("/") if base_url else None,
+        "model": model,
+        "params": params,
+        "messages": _canonical_messages(messages),
+    }
+    return _sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class LLMResponseCache:
+    """
+    One JSON file per response under cache_dir/<key[:2]>/<key>.json. Hits
+    refresh the file's mtime, and the least recently used entries are deleted
+    once the directory grows past max_bytes. Safe to share between threads and
+    processes: files are written under a temporary name and renamed.
+
+    `enabled=False` turns every lookup into a miss and stores nothing.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = 256 * 1024 * 1024, enabled: bool = True) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = self.misses = self.bypassed = self.stored = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str, bypass: bool = False) -> Optional[str]:
+        """Stored response content for key, or None (always None when bypassed or disabled)."""
+        if bypass or not self.enabled:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            content = entry["content"]
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: str, model: Optional[str] = None) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        data = json.dumps({"model": model, "created": time.time(), "content": content}, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            # a read-only cache dir just runs uncached
+            return
+        with self._lock:
+            self.stored += 1
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += len(data)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.prune()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for p in self.cache_dir.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def prune(self, max_bytes: Optional[int] = None, older_than: Optional[float] = None) -> int:
+        """
+        Delete least recently used entries until the cache fits max_bytes
+        (default: the configured limit), and every entry not used for
+        `older_than` seconds. Returns the number of files removed.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        cutoff = time.time() - older_than if older_than is not None else None
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, p in entries:
+            if total <= limit and (cutoff is None or mtime >= cutoff):
+                continue
+            try:
+                p.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._bytes = total
+        return removed
+
+    def clear(self) -> int:
+        return self.prune(max_bytes=0)
+
+    def stats(self, scan: bool = False) -> Dict[str, Any]:
+        """Hit / miss counters of this process; `scan=True` adds entry count and size on disk."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            out: Dict[str, Any] = {
+                "enabled": self.enabled,
+                "dir": str(self.cache_dir),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stored": self.stored,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        if scan:
+            entries = self._entries()
+            out["entries"] = len(entries)
+            out["bytes"] = sum(size for _, size, _ in entries)
+            out["oldest"] = min((m for m, _, _ in entries), default=None)
+            out["newest"] = max((m for m, _, _ in entries), default=None)
+        return out
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(
+    cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None, enabled: Optional[bool] = None
+) -> LLMResponseCache:
+    """Process-wide cache; passing any argument reconfigures it."""
+    global _cache
+    with _cache_lock:
+        if _cache is None or cache_dir is not None or max_bytes is not None or enabled is not None:
+            _cache = LLMResponseCache(
+                cache_dir=cache_dir,
+                max_bytes=256 * 1024 * 1024 if max_bytes is None else max_bytes,
+                enabled=True if enabled is None else enabled,
+            )
+        return _cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or prune the LLM response cache.")
+    parser.add_argument("--dir", default=None, help=f"Cache directory (default {default_cache_dir()}).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="entry count and size on disk")
+    prune = sub.add_parser("prune", help="drop least recently used entries")
+    prune.add_argument("--max-mb", type=float, default=256, help="Keep at most this many MiB.")
+    prune.add_argument("--older-than-days", type=float, default=None, help="Also drop entries unused for this long.")
+    sub.add_parser("clear", help="delete every entry")
+    args = parser.parse_args()
+
+    cache = LLMResponseCache(Path(args.dir) if args.dir else None)
+    if args.command == "prune":
+        older = args.older_than_days * 86400 if args.older_than_days is not None else None
+        print(f"removed {cache.prune(max_bytes=int(args.max_mb * 1024 * 1024), older_than=older)} entries")
+    elif args.command == "clear":
+        print(f"removed {cache.clear()} entries")
+    s = cache.stats(scan=True)
+    print(f"{s['dir']}: {s['entries']} entries, {s['bytes'] / 1024 / 1024:.1f} MiB")
@@ -1,32 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Literal, Optional
 
 from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
-from openai import OpenAI
 
 from backend.file_utils import (
-    default_skeleton,
-    load_skeleton,
-    locate_csv,
-    locate_image,
-    locate_skeleton,
-    read_csv_grid,
-    collect_columns,
+    file_version,
     save_skeleton,
-    scan_tables,
+    skeleton_save_path,
+    table_lock,
     write_csv_grid,
 )
-from backend.models import GridData, SkeletonModel, TableDetail, TableInfo
+from backend.grid_patch import GridPatchError, apply_grid_ops
+from backend.column_cache import (
+    CACHE_NAME,
+    column_sources,
+    is_fresh,
+    load_column_cache,
+    make_entry,
+    rel_key,
+    save_column_cache,
+    stale_report,
+)
+from backend.column_readers import read_columns_parallel
+from backend.export import export_corpus, load_from_files
+from backend.http_cache import cache_headers, etag_for, file_etag, is_not_modified, paths_etag
+from backend.image_cache import MEDIA_TYPES, ImageDerivativeCache, InlineImageEncoder
+from backend.jobs import Job, JobManager
+from backend.llm import LLMBusy, LLMClientPool
+from backend.llm_cache import LLMResponseCache, request_key
+from backend.models import GridData, GridPatch, SkeletonModel, TableDetail, TableInfo
+from backend.packed_store import PackedStore, get_packed_store
+from backend.paper_scan import paper_data_files, paper_pdfs, scan_paper_dir, within
+from backend.table_cache import TableCache
+from backend.write_queue import WriteBehindQueue
+from backend.table_index import SORT_KEYS, filter_tables, get_table_index, summarize_tables
+from backend.var_matcher import get_matcher, load_abbreviations
 
 
 class AppConfig(BaseSettings):
     root_dir: Path = Path.cwd()
     openai_api_key: str | None = None
     openai_base_url: str | None = None
+    index_refresh_interval: float = 2.0
+    # pickle / unlistable R files larger than this are skipped when collecting columns; None = no limit
+    column_full_read_max_bytes: int | None = 256 * 1024 * 1024
+    column_workers: int = 4
+    column_file_timeout: float = 60.0
+    # resized / WebP copies of table images; None = a folder in the system temp dir
+    image_cache_dir: Path | None = None
+    image_cache_max_bytes: int = 512 * 1024 * 1024
+    # parsed grids + skeletons kept in memory, by approximate size
+    table_cache_max_bytes: int = 64 * 1024 * 1024
+    # coalesce saves to the same table arriving within this window (write-behind); 0 = write immediately
+    write_coalesce_ms: int = 0
+    # "files": loose csv / skeleton / image files under root_dir; "sqlite": one packed
+    # database <root_dir>/<packed_db_name> (backend/packed_store.py converts between the two)
+    storage: Literal["files", "sqlite"] = "files"
+    packed_db_name: str = "corpus.sqlite"
+    llm_model: str = "gpt-4o-mini"
+    # LLM calls in flight at once; more wait up to llm_queue_timeout seconds, then get 503
+    llm_max_concurrency: int = 4
+    llm_queue_timeout: float = 30.0
+    llm_timeout: float = 120.0
+    # parsed LLM answers keyed by image bytes + prompt + model; None = the cache dir shared with pre_annotator
+    llm_cache_dir: Path | None = None
+    llm_cache_max_bytes: int = 256 * 1024 * 1024
+    llm_cache_enabled: bool = True
+    # images sent to the LLM inline: margins trimmed, longest edge / encoded size capped
+    llm_image_max_edge: int = 2048
+    llm_image_max_bytes: int = 1024 * 1024
 
     class Config:
         env_prefix = "APP_"
@@ -40,6 +90,20 @@ class ConfigUpdate(BaseModel):
 
 
 settings = AppConfig()
+jobs = JobManager()
+image_cache = ImageDerivativeCache(settings.image_cache_dir, max_bytes=settings.image_cache_max_bytes)
+table_cache = TableCache(max_bytes=settings.table_cache_max_bytes)
+prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+writes = WriteBehindQueue(settings.write_coalesce_ms / 1000)
+llm = LLMClientPool(
+    max_concurrency=settings.llm_max_concurrency,
+    timeout=settings.llm_timeout,
+    queue_timeout=settings.llm_queue_timeout,
+)
+inline_images = InlineImageEncoder(
+    settings.image_cache_dir, max_edge=settings.llm_image_max_edge, max_bytes=settings.llm_image_max_bytes
+)
+llm_cache = LLMResponseCache(settings.llm_cache_dir, max_bytes=settings.llm_cache_max_bytes, enabled=settings.llm_cache_enabled)
 
 app = FastAPI(title="Econ Table Annotator", version="0.1.0")
 app.add_middleware(
@@ -49,6 +113,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# large grids and context payloads; images are already compressed and excluded by starlette
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+
+@app.on_event("shutdown")
+def shutdown_jobs() -> None:
+    writes.close()
+    jobs.shutdown()
+    prefetcher.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+async def close_llm_clients() -> None:
+    await llm.aclose()
 
 
 def resolve_root_dir(root_dir: Optional[Path]) -> Path:
@@ -58,6 +136,25 @@ def resolve_root_dir(root_dir: Optional[Path]) -> Path:
     return candidate
 
 
+def table_index(base: Path):
+    return get_table_index(base, refresh_interval=settings.index_refresh_interval)
+
+
+def packed_store(base: Path) -> Optional[PackedStore]:
+    """The packed store of root_dir when storage=sqlite, else None (loose files)."""
+    if settings.storage != "sqlite":
+        return None
+    db = base / settings.packed_db_name
+    if not db.exists():
+        raise HTTPException(status_code=400, detail=f"Packed store {db} does not exist")
+    return get_packed_store(db)
+
+
+def all_tables(base: Path) -> List[TableInfo]:
+    store = packed_store(base)
+    return store.tables() if store else table_index(base).tables()
+
+
 @app.get("/api/config")
 def get_config():
     return {
@@ -83,41 +180,132 @@ def update_config(update: ConfigUpdate):
     }
 
 
+def table_to_dict(t: TableInfo) -> dict:
+    return {
+        "paper_id": t.paper_id,
+        "table_id": t.table_id,
+        "csv_path": str(t.csv_path),
+        "image_path": str(t.image_path) if t.image_path else None,
+        "skeleton_path": str(t.skeleton_path) if t.skeleton_path else None,
+        "status": t.status,
+    }
+
+
 @app.get("/api/projects")
-def list_projects(root_dir: Optional[Path] = Query(None)):
+def list_projects(
+    root_dir: Optional[Path] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    paper_prefix: Optional[str] = Query(None),
+    paper_id: Optional[str] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    exclude_status: Optional[List[str]] = Query(None),
+    has_image: Optional[bool] = Query(None),
+    has_skeleton: Optional[bool] = Query(None),
+    sort: Literal["paper_id", "table_id", "status"] = Query("paper_id"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    after_paper_id: Optional[str] = Query(None),
+    after_table_id: Optional[str] = Query(None),
+):
+    """
+    Filtered, sorted page of the table index. Without `limit` every matching
+    row is returned; `next_offset` is null on the last page. `after_paper_id` /
+    `after_table_id` keep only rows sorted after that table (which itself may
+    be filtered out), e.g. the next unfinished tables after the current one.
+    """
     base = resolve_root_dir(root_dir)
-    tables = scan_tables(base)
-    return [
-        {
-            "paper_id": t.paper_id,
-            "table_id": t.table_id,
-            "csv_path": str(t.csv_path),
-            "image_path": str(t.image_path) if t.image_path else None,
-            "skeleton_path": str(t.skeleton_path) if t.skeleton_path else None,
-            "status": t.status,
-        }
-        for t in tables
-    ]
+    writes.flush()
+    everything = all_tables(base)
+    tables = filter_tables(
+        everything,
+        paper_prefix=paper_prefix,
+        paper_id=paper_id,
+        statuses=status,
+        has_image=has_image,
+        has_skeleton=has_skeleton,
+        exclude_statuses=exclude_status,
+    )
+    key = SORT_KEYS[sort]
+    if after_paper_id is not None and after_table_id is not None:
+        cursor = next((t for t in everything if t.paper_id == after_paper_id and t.table_id == after_table_id), None)
+        if cursor is not None:
+            ck = key(cursor)
+            tables = [t for t in tables if (key(t) < ck if order == "desc" else key(t) > ck)]
+    tables.sort(key=key, reverse=order == "desc")
+    total = len(tables)
+    end = total if limit is None else min(total, offset + limit)
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": end if end < total else None,
+        "items": [table_to_dict(t) for t in tables[offset:end]],
+    }
+
+
+@app.get("/api/projects/summary")
+def projects_summary(
+    root_dir: Optional[Path] = Query(None),
+    paper_prefix: Optional[str] = Query(None),
+    has_image: Optional[bool] = Query(None),
+    has_skeleton: Optional[bool] = Query(None),
+):
+    """
+    Per-status and per-paper counts computed from the index.
+    """
+    base = resolve_root_dir(root_dir)
+    writes.flush()
+    tables = filter_tables(
+        all_tables(base),
+        paper_prefix=paper_prefix,
+        has_image=has_image,
+        has_skeleton=has_skeleton,
+    )
+    return summarize_tables(tables)
+
+
+@app.post("/api/projects/rebuild")
+def rebuild_projects(root_dir: Optional[Path] = Query(None)):
+    """
+    Drop the in-memory table index for root_dir and walk the tree again.
+    """
+    base = resolve_root_dir(root_dir)
+    store = packed_store(base)
+    count = len(store.tables()) if store else table_index(base).rebuild()
+    return {"ok": True, "tables": count}
 
 
 def find_table_paths(base: Path, paper_id: str, table_id: str):
-    csv_path = locate_csv(base, paper_id, table_id)
-    if not csv_path:
+    info = table_index(base).lookup(paper_id, table_id)
+    if not info:
         raise HTTPException(status_code=404, detail="CSV not found for table")
-    image_path = locate_image(csv_path)
-    skeleton_path = locate_skeleton(csv_path)
-    return csv_path, image_path, skeleton_path
+    return info.csv_path, info.image_path, info.skeleton_path
 
 
 @app.get("/api/table/{paper_id}/{table_id}")
-def get_table_detail(paper_id: str, table_id: str, root_dir: Optional[Path] = Query(None)) -> TableDetail:
+def get_table_detail(
+    paper_id: str,
+    table_id: str,
+    request: Request,
+    response: Response,
+    root_dir: Optional[Path] = Query(None),
+) -> TableDetail:
     base = resolve_root_dir(root_dir)
+    store = packed_store(base)
+    if store:
+        return packed_table_detail(store, request, paper_id, table_id)
     csv_path, image_path, skeleton_path = find_table_paths(base, paper_id, table_id)
-    grid = read_csv_grid(csv_path)
-    try:
-        skeleton = load_skeleton(csv_path)
-    except Exception:
-        skeleton = default_skeleton(paper_id, table_id, csv_path, image_path)
+    if writes.flush(csv_path):
+        # a deferred save may have just created the skeleton
+        csv_path, image_path, skeleton_path = find_table_paths(base, paper_id, table_id)
+    etag, mtime = paths_etag([csv_path, image_path, skeleton_path or csv_path.with_suffix(".skeleton.json")])
+    headers = cache_headers(etag, mtime)
+    if is_not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    grid_version = file_version(csv_path)
+    grid = table_cache.grid(csv_path)
+    skeleton = table_cache.skeleton(csv_path, skeleton_path, paper_id, table_id, image_path)
     info = TableInfo(
         paper_id=paper_id,
         table_id=table_id,
@@ -126,7 +314,68 @@ def get_table_detail(paper_id: str, table_id: str, root_dir: Optional[Path] = Qu
         skeleton_path=skeleton_path,
         status=skeleton.status if skeleton else "in_progress",
     )
-    return TableDetail(info=info, grid=grid, skeleton=skeleton)
+    return TableDetail(info=info, grid=grid, skeleton=skeleton, grid_version=grid_version)
+
+
+def packed_lookup(store: PackedStore, paper_id: str, table_id: str) -> TableInfo:
+    info = store.lookup(paper_id, table_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="CSV not found for table")
+    return info
+
+
+def packed_table_detail(store: PackedStore, request: Request, paper_id: str, table_id: str):
+    info = packed_lookup(store, paper_id, table_id)
+    etag = etag_for(*store.etag_parts(paper_id, table_id))
+    headers = cache_headers(etag)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    skeleton = store.load_skeleton(paper_id, table_id)
+    detail = TableDetail(
+        info=info,
+        grid=store.read_grid(paper_id, table_id),
+        skeleton=skeleton,
+        grid_version=store.version(paper_id, table_id),
+    )
+    return JSONResponse(jsonable_encoder(detail), headers=headers)
+
+
+class TableRef(BaseModel):
+    paper_id: str
+    table_id: str
+
+
+class PrefetchRequest(BaseModel):
+    # the tables the frontend will open next, e.g. the next unfinished ones
+    tables: List[TableRef] = Field(..., max_length=20)
+    image_w: Optional[int] = Field(None, ge=16, le=8192)
+    image_format: Optional[Literal["png", "webp", "jpeg"]] = None
+
+
+def warm_table(base: Path, ref: TableRef, image_w: Optional[int], image_format: Optional[str]) -> None:
+    try:
+        info = table_index(base).lookup(ref.paper_id, ref.table_id)
+        if not info:
+            return
+        table_cache.grid(info.csv_path)
+        table_cache.skeleton(info.csv_path, info.skeleton_path, ref.paper_id, ref.table_id, info.image_path)
+        if info.image_path and (image_w or image_format):
+            image_cache.derivative(info.image_path, image_w, image_format)
+    except Exception:
+        # best effort: the detail request will surface the error
+        pass
+
+
+@app.post("/api/prefetch", status_code=202)
+def prefetch_tables(payload: PrefetchRequest = Body(...), root_dir: Optional[Path] = Query(None)):
+    """Warm the caches for the given tables in the background and return immediately."""
+    base = resolve_root_dir(root_dir)
+    if packed_store(base):
+        # nothing to warm: reads from the packed store are single indexed lookups
+        return {"scheduled": []}
+    for ref in payload.tables:
+        prefetcher.submit(warm_table, base, ref, payload.image_w, payload.image_format)
+    return {"scheduled": [t.model_dump() for t in payload.tables]}
 
 
 class GridUpdate(BaseModel):
@@ -142,9 +391,70 @@ def save_csv(
     root_dir: Optional[Path] = Query(None),
 ):
     base = resolve_root_dir(root_dir)
+    grid = GridData(header=payload.header, rows=payload.rows)
+    store = packed_store(base)
+    if store:
+        info = packed_lookup(store, paper_id, table_id)
+        with table_lock(info.csv_path):
+            version = store.write_grid(paper_id, table_id, grid)
+        return {"ok": True, "csv_path": str(info.csv_path), "version": version, "queued": False}
     csv_path, _, _ = find_table_paths(base, paper_id, table_id)
-    write_csv_grid(csv_path, GridData(header=payload.header, rows=payload.rows))
-    return {"ok": True, "csv_path": str(csv_path)}
+
+    def write() -> None:
+        write_csv_grid(csv_path, grid)
+        table_cache.invalidate(csv_path)
+
+    queued = writes.submit(csv_path, "csv", write)
+    # a queued write has no version yet; the client falls back to a full save next time
+    return {"ok": True, "csv_path": str(csv_path), "version": None if queued else file_version(csv_path), "queued": queued}
+
+
+@app.post("/api/table/{paper_id}/{table_id}/patch_csv")
+def patch_csv(
+    paper_id: str,
+    table_id: str,
+    payload: GridPatch = Body(...),
+    root_dir: Optional[Path] = Query(None),
+):
+    """
+    Apply cell/row/column ops to the CSV on disk. `base_version` is the
+    grid_version the client edited; if the file changed since, nothing is
+    written and 409 carries the current version.
+    """
+    base = resolve_root_dir(root_dir)
+    store = packed_store(base)
+    if store:
+        lock_path = packed_lookup(store, paper_id, table_id).csv_path
+        current_version = lambda: store.version(paper_id, table_id)
+        read = lambda: store.read_grid(paper_id, table_id)
+
+        def write(grid: GridData) -> str:
+            return store.write_grid(paper_id, table_id, grid)
+
+    else:
+        lock_path, _, _ = find_table_paths(base, paper_id, table_id)
+        writes.flush(lock_path)
+        current_version = lambda: file_version(lock_path)
+        read = lambda: table_cache.grid(lock_path)
+
+        def write(grid: GridData) -> str:
+            write_csv_grid(lock_path, grid)
+            table_cache.invalidate(lock_path)
+            return file_version(lock_path)
+
+    with table_lock(lock_path):
+        current = current_version()
+        if current != payload.base_version:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "CSV changed since it was loaded", "version": current},
+            )
+        try:
+            grid = apply_grid_ops(read(), payload.ops)
+        except GridPatchError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        version = write(grid)
+    return {"ok": True, "version": version, "rows": len(grid.rows), "cols": len(grid.header)}
 
 
 @app.post("/api/table/{paper_id}/{table_id}/save_skeleton")
@@ -155,47 +465,78 @@ def save_skeleton_api(
     root_dir: Optional[Path] = Query(None),
 ):
     base = resolve_root_dir(root_dir)
+    store = packed_store(base)
+    if store:
+        info = packed_lookup(store, paper_id, table_id)
+        with table_lock(info.csv_path):
+            name = store.save_skeleton(paper_id, table_id, skeleton)
+        return {"ok": True, "skeleton_path": str(info.csv_path.with_name(name)), "queued": False}
     csv_path, _, _ = find_table_paths(base, paper_id, table_id)
-    saved_path = save_skeleton(csv_path, skeleton)
-    return {"ok": True, "skeleton_path": str(saved_path)}
+    target = skeleton_save_path(csv_path)
+
+    def write() -> None:
+        save_skeleton(csv_path, skeleton)
+        table_cache.invalidate(target)
+        table_index(base).touch(target.parent)
+
+    queued = writes.submit(csv_path, "skeleton", write)
+    return {"ok": True, "skeleton_path": str(target), "queued": queued}
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {"tables": table_cache.stats(), "writes": writes.stats(), "llm": llm.stats(), "llm_cache": llm_cache.stats(), "inline_images": inline_images.stats()}
 
 
 @app.get("/api/table/{paper_id}/{table_id}/image")
-def fetch_image(paper_id: str, table_id: str, root_dir: Optional[Path] = Query(None)):
+def fetch_image(
+    paper_id: str,
+    table_id: str,
+    request: Request,
+    root_dir: Optional[Path] = Query(None),
+    w: Optional[int] = Query(None, ge=16, le=8192, description="Maximum width in pixels (never upscaled)."),
+    format: Optional[Literal["png", "webp", "jpeg"]] = Query(None),
+):
     base = resolve_root_dir(root_dir)
-    csv_path, image_path, _ = find_table_paths(base, paper_id, table_id)
+    store = packed_store(base)
+    if store:
+        packed_lookup(store, paper_id, table_id)
+        image_path = store.image_file(paper_id, table_id, image_cache.cache_dir / "packed")
+    else:
+        _, image_path, _ = find_table_paths(base, paper_id, table_id)
     if not image_path or not image_path.exists():
         raise HTTPException(status_code=404, detail="Image not found for table")
-    return FileResponse(image_path)
+    mtime = image_path.stat().st_mtime
+    etag = file_etag(image_path, w, format)
+    headers = cache_headers(etag, mtime)
+    if is_not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+    served = image_cache.derivative(image_path, w, format) if (w or format) else image_path
+    return FileResponse(served, media_type=MEDIA_TYPES.get(served.suffix.lower()), headers=headers)
 
 
 @app.get("/api/paper/{paper_id}/context")
-def get_paper_context(paper_id: str, root_dir: Optional[Path] = Query(None)):
+def get_paper_context(paper_id: str, request: Request, root_dir: Optional[Path] = Query(None)):
     base_root = resolve_root_dir(root_dir)
     paper_root = base_root / paper_id if (base_root / paper_id).exists() else base_root
-    data_dir = paper_root / "data"
-    papers_dir = paper_root / "papers"
+    files = scan_paper_dir(paper_root)
+    data_files = paper_data_files(files, paper_id)
+    pdfs = paper_pdfs(files, paper_id)
     code_dir = paper_root / "code"
-    cache_file = paper_root / ".columns_cache.json"
-
-    data_files = []
-    data_exts = {".csv", ".tsv", ".dta", ".sav", ".sas7bdat", ".rds", ".rdata", ".feather", ".parquet", ".xlsx", ".xls", ".pkl"}
-    if data_dir.exists():
-        for ext in data_exts:
-            data_files += list(data_dir.rglob(f"*{ext}"))
+    if code_dir.is_dir():
+        code_docs = within(files.docs, code_dir)
     else:
-        # fallback: only files that include paper_id in name
-        for ext in data_exts:
-            data_files += [p for p in paper_root.rglob(f"*{ext}") if paper_id in p.name]
+        code_docs = [p for p in files.docs if paper_id in p.name]
 
-    # Prefer cached columns; only compute if cache exists (refresh endpoint writes it)
-    columns = []
-    if cache_file.exists():
-        try:
-            import json
-            columns = json.loads(cache_file.read_text(encoding="utf-8")).get("columns", [])
-        except Exception:
-            columns = []
+    # everything below is derived from the column cache and these file lists
+    etag, mtime = paths_etag([paper_root / CACHE_NAME, *data_files, *pdfs, *code_docs], len(data_files), len(pdfs))
+    headers = cache_headers(etag, mtime)
+    if is_not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    # Columns come from the cache written by refresh_columns; report which files changed since
+    cache = load_column_cache(paper_root)
+    stale = stale_report(cache, data_files, paper_root)
 
     def rel_path(p: Path) -> str:
         try:
@@ -203,57 +544,168 @@ def get_paper_context(paper_id: str, root_dir: Optional[Path] = Query(None)):
         except Exception:
             return str(p)
 
-    pdfs = []
-    if papers_dir.exists():
-        pdfs = list(papers_dir.glob(f"nomask_{paper_id}.pdf"))
-        pdfs += [p for p in papers_dir.glob("*.pdf") if p not in pdfs]
-    else:
-        pdfs = list(paper_root.glob(f"nomask_{paper_id}.pdf")) + [p for p in paper_root.glob("*.pdf") if paper_id in p.name]
-
-    code_docs = []
-    doc_exts = {".pdf", ".md", ".txt"}
-    if code_dir.exists():
-        for ext in doc_exts:
-            code_docs += list(code_dir.rglob(f"*{ext}"))
-    else:
-        for ext in doc_exts:
-            code_docs += [p for p in paper_root.rglob(f"*{ext}") if paper_id in p.name]
-
-    return {
-        "columns": columns,
-        "pdfs": [rel_path(p) for p in pdfs],
-        "code_docs": [rel_path(p) for p in code_docs],
-    }
+    return JSONResponse(
+        {
+            "columns": cache["columns"],
+            "columns_stale": any(stale.values()),
+            "stale_files": stale,
+            "column_sources": column_sources(cache["files"]),
+            "pdfs": [rel_path(p) for p in pdfs],
+            "code_docs": [rel_path(p) for p in code_docs],
+        },
+        headers=headers,
+    )
 
 
 @app.post("/api/paper/{paper_id}/refresh_columns")
-def refresh_columns(paper_id: str, root_dir: Optional[Path] = Query(None)):
+def refresh_columns(paper_id: str, root_dir: Optional[Path] = Query(None), force: bool = Query(False)):
     """
-    Force-rescan data files under the paper directory and cache the column names.
+    Re-read data files that changed since the last refresh (all of them with
+    force=true) and update the per-file column cache.
     """
     base_root = resolve_root_dir(root_dir)
     paper_root = base_root / paper_id if (base_root / paper_id).exists() else base_root
-    data_dir = paper_root / "data"
-    data_files = []
-    data_exts = {".csv", ".tsv", ".dta", ".sav", ".sas7bdat", ".rds", ".rdata", ".feather", ".parquet", ".xlsx", ".xls", ".pkl"}
-    if data_dir.exists():
-        for ext in data_exts:
-            data_files += list(data_dir.rglob(f"*{ext}"))
-    else:
-        for ext in data_exts:
-            data_files += [p for p in paper_root.rglob(f"*{ext}") if paper_id in p.name]
+    data_files = paper_data_files(scan_paper_dir(paper_root), paper_id)
 
     if not data_files:
         raise HTTPException(status_code=404, detail="No data files found to extract columns")
 
-    columns = collect_columns(data_files)
-    cache_file = paper_root / ".columns_cache.json"
+    job = jobs.submit(
+        "refresh_columns", str(paper_root.resolve()), run_refresh_columns, paper_root, sorted(set(data_files)), force
+    )
+    return JSONResponse(job.to_dict(), status_code=202)
+
+
+def run_refresh_columns(job: Job, paper_root: Path, data_files: List[Path], force: bool = False) -> dict:
+    def progress(done: int, total: int) -> None:
+        job.progress = {"done": done, "total": total, "reused": len(data_files) - len(to_read)}
+
+    cache = load_column_cache(paper_root)
+    old_files = cache["files"]
+    keys = [rel_key(p, paper_root) for p in data_files]
+    to_read = [p for p, k in zip(data_files, keys) if force or not is_fresh(old_files.get(k), p)]
+    progress(0, len(to_read))
+    results = read_columns_parallel(
+        to_read,
+        workers=settings.column_workers,
+        file_timeout=settings.column_file_timeout,
+        max_full_read_bytes=settings.column_full_read_max_bytes,
+        progress=progress,
+    ) if to_read else []
+    fresh = {rel_key(p, paper_root): make_entry(p, r) for p, r in zip(to_read, results)}
+    files = {k: fresh[k] if k in fresh else old_files[k] for k in keys}
+    cache = save_column_cache(paper_root, files)
+    errors = [{"path": k, "error": e["error"]} for k, e in files.items() if e.get("error")]
+    return {
+        "columns": cache["columns"],
+        "read": len(to_read),
+        "reused": len(data_files) - len(to_read),
+        "errors": errors,
+    }
+
+
+class MatchVarsRequest(BaseModel):
+    # labels as currently edited; None = the saved skeleton
+    skeleton: SkeletonModel | None = None
+    k: int = Field(5, ge=1, le=50)
+
+
+@app.post("/api/table/{paper_id}/{table_id}/match_vars")
+def match_vars(
+    paper_id: str,
+    table_id: str,
+    payload: MatchVarsRequest = Body(default_factory=MatchVarsRequest),
+    root_dir: Optional[Path] = Query(None),
+):
+    """
+    Top-k dataset columns (from the paper's column cache) for every y column,
+    x row and FE row label, matched locally (backend/var_matcher.py) with the
+    paper's var_abbreviations.json, if any.
+    """
+    base = resolve_root_dir(root_dir)
+    skeleton = payload.skeleton
+    if skeleton is None:
+        store = packed_store(base)
+        if store:
+            packed_lookup(store, paper_id, table_id)
+            skeleton = store.load_skeleton(paper_id, table_id)
+        else:
+            csv_path, image_path, skeleton_path = find_table_paths(base, paper_id, table_id)
+            writes.flush(csv_path)
+            skeleton = table_cache.skeleton(csv_path, skeleton_path, paper_id, table_id, image_path)
+    paper_root = base / paper_id if (base / paper_id).exists() else base
+    columns = load_column_cache(paper_root)["columns"]
+    if not columns:
+        raise HTTPException(status_code=404, detail="No cached columns for this paper; refresh columns first")
+
+    matcher = get_matcher(columns, load_abbreviations(paper_root))
+    sections = [
+        ("y_columns", "col", [(y.col, y.depvar_label, y.depvar_data_name) for y in skeleton.y_columns]),
+        ("x_rows", "row", [(x.row, x.display_label, x.data_var_name) for x in skeleton.x_rows]),
+        ("fe_rows", "row", [(fe.row, fe.label, fe.data_var_name) for fe in skeleton.fe_rows]),
+    ]
+    results = matcher.match([label or "" for _, _, items in sections for _, label, _ in items], k=payload.k)
+    known = set(matcher.columns)
+    out: dict = {"columns": len(matcher.columns)}
+    pos = 0
+    for name, key, items in sections:
+        out[name] = []
+        for index, label, current in items:
+            candidates = results[pos]
+            pos += 1
+            out[name].append(
+                {
+                    key: index,
+                    "label": label,
+                    "current": current,
+                    "current_in_columns": bool(current) and current in known,
+                    "candidates": [{"name": n, "score": score} for n, score in candidates],
+                }
+            )
+    return out
+
+
+class ExportRequest(BaseModel):
+    format: Literal["parquet", "jsonl"] = "parquet"
+    statuses: List[str] = Field(default_factory=list)
+    # server-side directory inside root_dir (relative paths are taken from root_dir); default <root_dir>/.export
+    out_dir: Optional[Path] = None
+
+
+def run_export(
+    job: Job, tables: List[TableInfo], out_dir: Path, fmt: str, statuses: List[str], store: Optional[PackedStore] = None
+) -> dict:
+    def progress(done: int) -> None:
+        job.progress = {"done": done, "total": len(tables)}
+
+    load = store.load_for_export if store else load_from_files
+    return export_corpus(tables, out_dir, fmt=fmt, statuses=statuses or None, progress=progress, load=load)
+
+
+@app.post("/api/export", status_code=202)
+def export_tables(payload: ExportRequest = Body(default_factory=ExportRequest), root_dir: Optional[Path] = Query(None)):
+    """Export the corpus as normalized Parquet / JSONL tables in a background job."""
+    base = resolve_root_dir(root_dir)
+    writes.flush()
+    store = packed_store(base)
+    tables = all_tables(base)
+    if payload.statuses:
+        tables = [t for t in tables if t.status in set(payload.statuses)]
+    out_dir = (base / (payload.out_dir or ".export")).resolve()
     try:
-        import json
-        cache_file.write_text(json.dumps({"columns": columns}, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-    return {"columns": columns}
+        out_dir.relative_to(base.resolve())
+    except ValueError:
+        raise HTTPException(status_code=403, detail="out_dir must be inside root_dir")
+    job = jobs.submit("export", str(out_dir), run_export, tables, out_dir, payload.format, payload.statuses, store)
+    return job.to_dict()
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @app.get("/api/paper/{paper_id}/doc")
@@ -272,27 +724,39 @@ def fetch_paper_doc(paper_id: str, path: str, root_dir: Optional[Path] = Query(N
 
 class SuggestRequest(BaseModel):
     instruction: str | None = None
+    # skip the response cache and ask the model again
+    no_cache: bool = False
+
+
+def load_grid_for_suggest(root_dir: Optional[Path], paper_id: str, table_id: str):
+    base = resolve_root_dir(root_dir)
+    store = packed_store(base)
+    if store:
+        info = packed_lookup(store, paper_id, table_id)
+        image = store.read_image(paper_id, table_id)
+        return store.read_grid(paper_id, table_id), info.image_path, image[1] if image else None
+    csv_path, image_path, _ = find_table_paths(base, paper_id, table_id)
+    writes.flush(csv_path)
+    return table_cache.grid(csv_path), image_path, image_path.read_bytes() if image_path else None
 
 
 @app.post("/api/table/{paper_id}/{table_id}/suggest_grid")
-def suggest_grid(
+async def suggest_grid(
     paper_id: str,
     table_id: str,
     payload: SuggestRequest,
-    request: Request,
     root_dir: Optional[Path] = Query(None),
 ):
     if not settings.openai_api_key:
         raise HTTPException(status_code=400, detail="OpenAI API key not configured")
 
-    base = resolve_root_dir(root_dir)
-    csv_path, image_path, _ = find_table_paths(base, paper_id, table_id)
-    grid = read_csv_grid(csv_path)
+    # file / sqlite access stays off the event loop
+    grid, image_path, image_bytes = await run_in_threadpool(load_grid_for_suggest, root_dir, paper_id, table_id)
 
+    # inline data url: a remote model cannot fetch this server's /image url
     image_url = None
-    if image_path:
-        # Build absolute URL for the served image
-        image_url = str(request.url_for("fetch_image", paper_id=paper_id, table_id=table_id))
+    if image_bytes:
+        image_url = await run_in_threadpool(inline_images.data_url, image_bytes, image_path.name)
 
     prompt = (
         "You are given a regression table image. "
@@ -303,7 +767,6 @@ def suggest_grid(
     if payload.instruction:
         prompt += f"User instruction: {payload.instruction}"
 
-    client = OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
     messages: list[dict] = [
         {"role": "system", "content": prompt},
         {
@@ -318,15 +781,23 @@ def suggest_grid(
             {"type": "image_url", "image_url": {"url": image_url}}
         )
 
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.2,
-        )
-        content = resp.choices[0].message.content if resp.choices else None
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM request failed: {e}")
+    cache_key = request_key(settings.llm_model, messages, base_url=settings.openai_base_url, temperature=0.2)
+    content = await run_in_threadpool(llm_cache.get, cache_key, payload.no_cache)
+    cached = content is not None
+    if not cached:
+        try:
+            resp = await llm.chat(
+                settings.openai_api_key,
+                settings.openai_base_url,
+                model=settings.llm_model,
+                messages=messages,
+                temperature=0.2,
+            )
+            content = resp.choices[0].message.content if resp.choices else None
+        except LLMBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"LLM request failed: {e}")
 
     import json
 
@@ -350,4 +821,6 @@ def suggest_grid(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse LLM output: {e}")
 
-    return {"ok": True, "rows": normalized}
+    if not cached:
+        await run_in_threadpool(llm_cache.put, cache_key, content, settings.llm_model)
+    return {"ok": True, "rows": normalized, "cached": cached}
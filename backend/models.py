@@ -1,6 +1,6 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -76,3 +76,23 @@ class TableDetail(BaseModel):
     info: TableInfo
     grid: GridData
     skeleton: SkeletonModel
+    grid_version: Optional[str] = None
+
+
+class GridOp(BaseModel):
+    """
+    One edit of a grid. `row` indexes data rows (the header is not a row),
+    `col` indexes columns; inserts place the new row/column before the index
+    (index == length appends).
+    """
+
+    op: Literal["set_cell", "set_header", "insert_row", "delete_row", "insert_col", "delete_col"]
+    row: Optional[int] = None
+    col: Optional[int] = None
+    value: Optional[str] = None
+    values: Optional[List[str]] = None
+
+
+class GridPatch(BaseModel):
+    base_version: str
+    ops: List[GridOp]
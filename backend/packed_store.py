@@ -0,0 +1,325 @@
+"""
+Packed corpus store: all tables of a root in one SQLite database instead of
+thousands of loose csv / skeleton.json / png files.
+
+    python -m backend.packed_store import --root D:\\annotations --db D:\\annotations\\corpus.sqlite
+    python -m backend.packed_store export --db D:\\annotations\\corpus.sqlite --root D:\\unpacked
+
+`import` packs a loose-file root (csv + skeleton + image per table, keeping
+each table's sub-directory); `export` writes the same layout back out.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .file_utils import atomic_write_text, csv_text, default_skeleton, parse_skeleton_text, scan_tables
+from .models import GridData, SkeletonModel, TableInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    paper_id TEXT NOT NULL,
+    table_id TEXT NOT NULL,
+    rel_dir TEXT NOT NULL DEFAULT '',
+    csv_name TEXT NOT NULL,
+    csv TEXT NOT NULL,
+    csv_version INTEGER NOT NULL DEFAULT 1,
+    skeleton_name TEXT,
+    skeleton TEXT,
+    status TEXT NOT NULL DEFAULT 'not_started',
+    updated REAL NOT NULL,
+    PRIMARY KEY (paper_id, table_id)
+);
+CREATE TABLE IF NOT EXISTS images (
+    paper_id TEXT NOT NULL,
+    table_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    digest TEXT,
+    PRIMARY KEY (paper_id, table_id)
+);
+"""
+
+# upsert that keeps csv_version increasing across re-imports, so versions handed out before stay stale
+UPSERT_TABLE_SQL = (
+    "INSERT INTO tables (paper_id, table_id, rel_dir, csv_name, csv, skeleton_name, skeleton, status, updated) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (paper_id, table_id) DO UPDATE SET rel_dir = excluded.rel_dir, csv_name = excluded.csv_name, "
+    "csv = excluded.csv, csv_version = tables.csv_version + 1, skeleton_name = excluded.skeleton_name, "
+    "skeleton = excluded.skeleton, status = excluded.status, updated = excluded.updated"
+)
+
+
+class PackedStore:
+    """
+    Same operations as the loose-file layout (scan, read grid, load / save
+    skeleton, write grid, fetch image) backed by one SQLite file. Images live in
+    their own table so listing and grid reads never touch image pages.
+
+    TableInfo paths are virtual (`<db>/<paper_id>/<file name>`); only their
+    names are meaningful.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # databases packed before images had a digest column
+            if "digest" not in {r[1] for r in conn.execute("PRAGMA table_info(images)")}:
+                conn.execute("ALTER TABLE images ADD COLUMN digest TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _info(self, row) -> TableInfo:
+        paper_id, table_id, csv_name, skeleton_name, status, image_name = row
+        base = self.db_path / paper_id
+        return TableInfo(
+            paper_id=paper_id,
+            table_id=table_id,
+            csv_path=base / csv_name,
+            image_path=base / image_name if image_name else None,
+            skeleton_path=base / skeleton_name if skeleton_name else None,
+            status=status,
+        )
+
+    _INFO_SQL = (
+        "SELECT t.paper_id, t.table_id, t.csv_name, t.skeleton_name, t.status, i.name "
+        "FROM tables t LEFT JOIN images i ON i.paper_id = t.paper_id AND i.table_id = t.table_id"
+    )
+
+    def tables(self) -> List[TableInfo]:
+        rows = self._connect().execute(self._INFO_SQL + " ORDER BY t.paper_id, t.table_id").fetchall()
+        return [self._info(r) for r in rows]
+
+    def lookup(self, paper_id: str, table_id: str) -> Optional[TableInfo]:
+        row = self._connect().execute(self._INFO_SQL + " WHERE t.paper_id = ? AND t.table_id = ?", (paper_id, table_id)).fetchone()
+        return self._info(row) if row else None
+
+    def version(self, paper_id: str, table_id: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT csv_version FROM tables WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)
+        ).fetchone()
+        return f"db{row[0]}" if row else None
+
+    def etag_parts(self, paper_id: str, table_id: str) -> Tuple:
+        """Changes whenever the grid, skeleton or status of the table changes."""
+        row = self._connect().execute(
+            "SELECT csv_version, updated FROM tables WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)
+        ).fetchone()
+        return (str(self.db_path), paper_id, table_id, *(row or ()))
+
+    def read_grid(self, paper_id: str, table_id: str) -> GridData:
+        import csv
+        import io
+
+        row = self._connect().execute("SELECT csv FROM tables WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)).fetchone()
+        if row is None:
+            raise KeyError(f"{paper_id}/{table_id}")
+        reader = list(csv.reader(io.StringIO(row[0], newline="")))
+        if not reader:
+            return GridData(header=[], rows=[])
+        header, *rows = reader
+        return GridData(header=header, rows=rows)
+
+    def write_grid(self, paper_id: str, table_id: str, grid: GridData) -> str:
+        with self._write_lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE tables SET csv = ?, csv_version = csv_version + 1, updated = ? WHERE paper_id = ? AND table_id = ?",
+                (csv_text([grid.header, *grid.rows]), time.time(), paper_id, table_id),
+            )
+            if cur.rowcount == 0:
+                raise KeyError(f"{paper_id}/{table_id}")
+        return self.version(paper_id, table_id)
+
+    def load_skeleton(self, paper_id: str, table_id: str) -> SkeletonModel:
+        info = self.lookup(paper_id, table_id)
+        if info is None:
+            raise KeyError(f"{paper_id}/{table_id}")
+        row = self._connect().execute(
+            "SELECT skeleton FROM tables WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)
+        ).fetchone()
+        if row and row[0]:
+            try:
+                return parse_skeleton_text(row[0])
+            except Exception:
+                pass
+        return default_skeleton(paper_id, table_id, info.csv_path, info.image_path)
+
+    def save_skeleton(self, paper_id: str, table_id: str, skeleton: SkeletonModel) -> str:
+        skeleton.last_modified = datetime.utcnow()
+        content = json.dumps(json.loads(skeleton.json()), ensure_ascii=False, indent=2)
+        name = f"{paper_id}_{table_id}.skeleton.json"
+        with self._write_lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE tables SET skeleton = ?, skeleton_name = ?, status = ?, updated = ? WHERE paper_id = ? AND table_id = ?",
+                (content, name, skeleton.status or "in_progress", time.time(), paper_id, table_id),
+            )
+            if cur.rowcount == 0:
+                raise KeyError(f"{paper_id}/{table_id}")
+        return name
+
+    def load_for_export(self, info: TableInfo) -> Tuple[GridData, Optional[SkeletonModel]]:
+        """export.TableLoader: grid and saved skeleton (None when there is none)."""
+        grid = self.read_grid(info.paper_id, info.table_id)
+        row = self._connect().execute(
+            "SELECT skeleton FROM tables WHERE paper_id = ? AND table_id = ?", (info.paper_id, info.table_id)
+        ).fetchone()
+        return grid, parse_skeleton_text(row[0]) if row and row[0] else None
+
+    def read_image(self, paper_id: str, table_id: str) -> Optional[Tuple[str, bytes]]:
+        row = self._connect().execute(
+            "SELECT name, data FROM images WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def image_file(self, paper_id: str, table_id: str, cache_dir: Path) -> Optional[Path]:
+        """
+        The image as a real file in cache_dir, for FileResponse and derivatives.
+        The blob is only read the first time (or after a re-import changed it:
+        the key covers the image digest and, for rows packed without one, the
+        table's last update).
+        """
+        row = self._connect().execute(
+            "SELECT i.name, length(i.data), i.digest, t.updated FROM images i "
+            "LEFT JOIN tables t ON t.paper_id = i.paper_id AND t.table_id = i.table_id "
+            "WHERE i.paper_id = ? AND i.table_id = ?",
+            (paper_id, table_id),
+        ).fetchone()
+        if row is None:
+            return None
+        name, size, digest, updated = row
+        key = hashlib.sha1(
+            f"{self.db_path}|{paper_id}|{table_id}|{name}|{size}|{digest}|{updated}".encode("utf-8")
+        ).hexdigest()
+        target = Path(cache_dir) / f"{key}{Path(name).suffix.lower()}"
+        if not target.exists():
+            image = self.read_image(paper_id, table_id)
+            if image is None:
+                return None
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(image[1])
+            tmp.replace(target)
+        return target
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_stores: Dict[str, PackedStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_packed_store(db_path: Path) -> PackedStore:
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = PackedStore(Path(key))
+            _stores[key] = store
+        return store
+
+
+def import_tree(root: Path, db_path: Path, batch_size: int = 500) -> int:
+    """
+    Pack every table under root into db_path; returns the table count.
+    Existing rows are overwritten, their csv_version bumped, and images no
+    longer in the tree are dropped.
+    """
+    root = Path(root)
+    store = PackedStore(db_path)
+    conn = store._connect()
+    count = 0
+    tables = scan_tables(root)
+    for start in range(0, len(tables), batch_size):
+        rows, images, no_image = [], [], []
+        for info in tables[start : start + batch_size]:
+            rel_dir = info.csv_path.parent.relative_to(root).as_posix()
+            rel_dir = "" if rel_dir == "." else rel_dir
+            skeleton = info.skeleton_path.read_text(encoding="utf-8") if info.skeleton_path else None
+            rows.append(
+                (
+                    info.paper_id,
+                    info.table_id,
+                    rel_dir,
+                    info.csv_path.name,
+                    info.csv_path.read_text(encoding="utf-8"),
+                    info.skeleton_path.name if info.skeleton_path else None,
+                    skeleton,
+                    info.status,
+                    info.csv_path.stat().st_mtime,
+                )
+            )
+            if info.image_path:
+                data = info.image_path.read_bytes()
+                images.append((info.paper_id, info.table_id, info.image_path.name, data, hashlib.sha1(data).hexdigest()))
+            else:
+                no_image.append((info.paper_id, info.table_id))
+        with conn:
+            conn.executemany(UPSERT_TABLE_SQL, rows)
+            conn.executemany(
+                "INSERT OR REPLACE INTO images (paper_id, table_id, name, data, digest) VALUES (?, ?, ?, ?, ?)", images
+            )
+            # an image removed from the source since the last import
+            conn.executemany("DELETE FROM images WHERE paper_id = ? AND table_id = ?", no_image)
+        count += len(rows)
+    store.close()
+    return count
+
+
+def export_tree(db_path: Path, root: Path) -> int:
+    """Unpack db_path into the loose-file layout under root; returns the table count."""
+    root = Path(root)
+    conn = PackedStore(db_path)._connect()
+    count = 0
+    for paper_id, table_id, rel_dir, csv_name, csv_body, skeleton_name, skeleton in conn.execute(
+        "SELECT paper_id, table_id, rel_dir, csv_name, csv, skeleton_name, skeleton FROM tables"
+    ):
+        directory = root / rel_dir if rel_dir else root
+        directory.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(directory / csv_name, csv_body, fsync=False)
+        if skeleton is not None:
+            atomic_write_text(directory / (skeleton_name or f"{paper_id}_{table_id}.skeleton.json"), skeleton, fsync=False)
+        image = conn.execute("SELECT name, data FROM images WHERE paper_id = ? AND table_id = ?", (paper_id, table_id)).fetchone()
+        if image:
+            (directory / image[0]).write_bytes(image[1])
+        count += 1
+    conn.close()
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert between the loose-file layout and a packed SQLite store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="loose files -> sqlite")
+    imp.add_argument("--root", required=True)
+    imp.add_argument("--db", required=True)
+    exp = sub.add_parser("export", help="sqlite -> loose files")
+    exp.add_argument("--db", required=True)
+    exp.add_argument("--root", required=True)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "import":
+        n = import_tree(Path(args.root), Path(args.db))
+    else:
+        n = export_tree(Path(args.db), Path(args.root))
+    print(f"{args.command}: {n} tables in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,141 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DATA_EXTS = {".csv", ".tsv", ".dta", ".sav", ".sas7bdat", ".rds", ".rdata", ".feather", ".parquet", ".xlsx", ".xls", ".pkl"}
+CODE_EXTS = {".py", ".r", ".jl", ".m", ".sas", ".do", ".ado", ".qmd", ".ipynb"}
+DOC_EXTS = {".pdf", ".md", ".txt"}
+
+_BUCKETS: Dict[str, str] = {}
+for _ext in DATA_EXTS:
+    _BUCKETS[_ext] = "data"
+for _ext in CODE_EXTS:
+    _BUCKETS[_ext] = "code"
+for _ext in DOC_EXTS:
+    _BUCKETS[_ext] = "pdf" if _ext == ".pdf" else "doc"
+
+
+@dataclass
+class PaperFiles:
+    """Files of one paper directory, bucketed by extension; each list is sorted."""
+
+    root: Path
+    data: List[Path] = field(default_factory=list)
+    code: List[Path] = field(default_factory=list)
+    doc: List[Path] = field(default_factory=list)
+    pdf: List[Path] = field(default_factory=list)
+
+    @property
+    def docs(self) -> List[Path]:
+        """pdf + md + txt, i.e. everything in DOC_EXTS."""
+        return sorted(self.doc + self.pdf)
+
+
+def within(paths: Iterable[Path], directory: Path, recursive: bool = True) -> List[Path]:
+    """Paths located in `directory` (or below it when recursive)."""
+    directory = Path(directory)
+    if recursive:
+        prefix = str(directory) + os.sep
+        return [p for p in paths if str(p).startswith(prefix)]
+    return [p for p in paths if p.parent == directory]
+
+
+def scan_paper_dir(root: Path) -> PaperFiles:
+    """
+    Walk a paper directory once with os.scandir and bucket files into
+    data / code / doc / pdf. Hidden directories (caches, VCS) are skipped.
+    """
+    root = Path(root)
+    found: Dict[str, List[str]] = {"data": [], "code": [], "doc": [], "pdf": []}
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.name.startswith("."):
+                                stack.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    bucket = _BUCKETS.get(os.path.splitext(entry.name)[1].lower())
+                    if bucket:
+                        found[bucket].append(entry.path)
+        except OSError:
+            continue
+    # sort as strings: comparing Path objects is much slower
+    return PaperFiles(root=root, **{k: [Path(p) for p in sorted(v)] for k, v in found.items()})
+
+
+def paper_data_files(files: PaperFiles, paper_id: str) -> List[Path]:
+    """Data files under <paper>/data, or, without that folder, files that carry paper_id in their name."""
+    data_dir = files.root / "data"
+    if data_dir.is_dir():
+        return within(files.data, data_dir)
+    return [p for p in files.data if paper_id in p.name]
+
+
+def paper_pdfs(files: PaperFiles, paper_id: str) -> List[Path]:
+    """`nomask_<paper_id>.pdf` first, then the other pdfs directly in papers/ (or the paper root)."""
+    papers_dir = files.root / "papers"
+    if papers_dir.is_dir():
+        candidates = within(files.pdf, papers_dir, recursive=False)
+    else:
+        candidates = [p for p in within(files.pdf, files.root, recursive=False) if paper_id in p.name]
+    preferred = [p for p in candidates if p.name == f"nomask_{paper_id}.pdf"]
+    return preferred + [p for p in candidates if p not in preferred]
+
+
+def _legacy_walk(root: Path) -> int:
+    """What get_paper_context + refresh_columns + ContextLoader did before: one rglob per extension."""
+    count = 0
+    for sub, exts in (("data", DATA_EXTS), ("data", DATA_EXTS), ("code", CODE_EXTS), ("code", DOC_EXTS)):
+        for ext in exts:
+            count += len(list((root / sub).rglob(f"*{ext}")))
+    return count
+
+
+def _make_synthetic_package(root: Path, n_dirs: int, files_per_dir: int) -> None:
+    exts = sorted(DATA_EXTS | CODE_EXTS | DOC_EXTS | {".log", ".png", ".json"})
+    for top in ("data", "code", "papers", "output"):
+        for d in range(n_dirs):
+            sub = root / top / f"dir{d // 10}" / f"sub{d}"
+            sub.mkdir(parents=True, exist_ok=True)
+            for i in range(files_per_dir):
+                (sub / f"f{i}{exts[i % len(exts)]}").touch()
+
+
+def benchmark(n_dirs: int = 200, files_per_dir: int = 50, repeat: int = 3, root: Optional[Path] = None) -> Dict[str, float]:
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(root) if root else Path(tmp)
+        if not root:
+            _make_synthetic_package(base, n_dirs, files_per_dir)
+        legacy = scandir = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _legacy_walk(base)
+            legacy = min(legacy, time.perf_counter() - start)
+            start = time.perf_counter()
+            scan_paper_dir(base)
+            scandir = min(scandir, time.perf_counter() - start)
+    return {"legacy_rglob_s": legacy, "scan_paper_dir_s": scandir, "speedup": legacy / scandir if scandir else 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare per-extension rglob with the single-pass scanner.")
+    parser.add_argument("--root", default=None, help="Existing paper directory (default: synthetic package in a temp dir).")
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(benchmark(args.dirs, args.files_per_dir, args.repeat, Path(args.root) if args.root else None))
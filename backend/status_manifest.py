@@ -0,0 +1,133 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+MANIFEST_NAME = ".skeleton_status.json"
+MANIFEST_VERSION = 1
+
+# save_skeleton writes `status` among the first keys, so it normally sits in the
+# first chunk; files written by other tools may put it later.
+_STATUS_RE = re.compile(rb'"status"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_PEEK_CHUNK = 4096
+_PEEK_LIMIT = 64 * 1024
+
+_dir_locks: Dict[str, threading.Lock] = {}
+_dir_locks_guard = threading.Lock()
+
+
+def _dir_lock(directory: Path) -> threading.Lock:
+    key = str(directory)
+    with _dir_locks_guard:
+        lock = _dir_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _dir_locks[key] = lock
+        return lock
+
+
+def _fingerprint(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def peek_skeleton_status(path: Path) -> Optional[str]:
+    """
+    Read the skeleton only until the `status` value shows up; fall back to a
+    full parse if it is not within the first _PEEK_LIMIT bytes.
+    """
+    try:
+        with open(path, "rb") as f:
+            buf = b""
+            while len(buf) < _PEEK_LIMIT:
+                chunk = f.read(_PEEK_CHUNK)
+                if not chunk:
+                    break
+                buf += chunk
+                match = _STATUS_RE.search(buf)
+                if match:
+                    return json.loads(b'"' + match.group(1) + b'"')
+            if len(buf) < _PEEK_LIMIT:
+                # whole file read and no status key
+                return None
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return data.get("status") if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+
+def load_manifest(directory: Path) -> Dict[str, dict]:
+    try:
+        data = json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def write_manifest(directory: Path, entries: Dict[str, dict]) -> None:
+    target = Path(directory) / MANIFEST_NAME
+    tmp = target.with_name(f"{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "entries": entries}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp, target)
+    except OSError:
+        # read-only mounts: the manifest is only an accelerator
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def read_statuses(directory: Path, names: Iterable[str], write: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Statuses for the given skeleton file names in one directory. Manifest
+    entries whose mtime/size still match the file are trusted; the rest are
+    re-read with `peek_skeleton_status` and, unless write=False, written back.
+    """
+    directory = Path(directory)
+    result: Dict[str, Optional[str]] = {}
+    with _dir_lock(directory):
+        entries = load_manifest(directory)
+        changed = False
+        for name in names:
+            fp = _fingerprint(directory / name)
+            if fp is None:
+                if entries.pop(name, None) is not None:
+                    changed = True
+                result[name] = None
+                continue
+            entry = entries.get(name)
+            if entry and (entry.get("mtime_ns"), entry.get("size")) == fp:
+                result[name] = entry.get("status")
+                continue
+            status = peek_skeleton_status(directory / name)
+            entries[name] = {"mtime_ns": fp[0], "size": fp[1], "status": status}
+            result[name] = status
+            changed = True
+        if changed and write:
+            write_manifest(directory, entries)
+    return result
+
+
+def record_status(skeleton_path: Path, status: Optional[str]) -> None:
+    """Called right after a skeleton was written so the next listing is a manifest hit."""
+    skeleton_path = Path(skeleton_path)
+    fp = _fingerprint(skeleton_path)
+    if fp is None:
+        return
+    directory = skeleton_path.parent
+    with _dir_lock(directory):
+        entries = load_manifest(directory)
+        entries[skeleton_path.name] = {"mtime_ns": fp[0], "size": fp[1], "status": status}
+        write_manifest(directory, entries)
@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .file_utils import default_skeleton, parse_skeleton_file, read_csv_grid
+from .models import GridData, SkeletonModel
+
+
+def _stamp(path: Optional[Path]) -> Optional[Tuple[int, int]]:
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def approx_size(obj) -> int:
+    """Rough in-memory footprint (sys.getsizeof summed over containers and model fields)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, BaseModel):
+        size += sum(approx_size(v) for v in obj.__dict__.values())
+    elif isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class TableCache:
+    """
+    LRU of parsed grids and skeletons bounded by their approximate size in
+    bytes. Entries are keyed by path and remember the size + mtime_ns of the
+    file they came from, so a file edited outside the app is reloaded; saves
+    through the API also `invalidate` explicitly. Returned models are shared:
+    callers must not mutate them.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        # (kind, path) -> (stamp, value, nbytes)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _get(self, kind: str, path: Path, load: Callable[[], object]):
+        key = (kind, str(path))
+        stamp = _stamp(path)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and stamp is not None and hit[0] == stamp:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return hit[1]
+            self._misses += 1
+        value = load()
+        if stamp is None:
+            return value
+        nbytes = approx_size(value)
+        if nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (stamp, value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+        return value
+
+    def grid(self, csv_path: Path) -> GridData:
+        return self._get("grid", csv_path, lambda: read_csv_grid(csv_path))
+
+    def skeleton(
+        self, csv_path: Path, skeleton_path: Optional[Path], paper_id: str, table_id: str, image_path: Optional[Path]
+    ) -> SkeletonModel:
+        """The saved skeleton, or a fresh default (not cached) when there is none or it cannot be parsed."""
+        if skeleton_path is None or not skeleton_path.exists():
+            return default_skeleton(paper_id, table_id, csv_path, image_path)
+        try:
+            return self._get("skeleton", skeleton_path, lambda: parse_skeleton_file(skeleton_path))
+        except Exception:
+            return default_skeleton(paper_id, table_id, csv_path, image_path)
+
+    def invalidate(self, path: Path) -> None:
+        """Forget everything parsed from `path` (a csv or skeleton file)."""
+        with self._lock:
+            for kind in ("grid", "skeleton"):
+                if (kind, str(path)) in self._entries:
+                    self._drop((kind, str(path)))
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
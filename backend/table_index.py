@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .file_utils import build_table_info, dir_statuses
+from .models import TableInfo
+
+
+@dataclass
+class _DirEntry:
+    mtime_ns: int
+    subdirs: List[str] = field(default_factory=list)
+    tables: List[TableInfo] = field(default_factory=list)
+
+
+def _dir_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class TableIndex:
+    """
+    In-memory listing of the tables under one root_dir.
+
+    The tree is walked once; afterwards only directory mtimes are checked and
+    directories whose mtime changed (a file was added, removed or renamed) are
+    re-listed. Saves that rewrite a file in place do not bump the directory
+    mtime, so callers should `touch()` the directory after writing.
+    """
+
+    def __init__(self, root_dir: Path, refresh_interval: float = 2.0) -> None:
+        self.root = Path(root_dir)
+        self.refresh_interval = refresh_interval
+        self._dirs: Dict[str, _DirEntry] = {}
+        self._by_key: Dict[Tuple[str, str], TableInfo] = {}
+        self._sorted: List[TableInfo] = []
+        self._dirty = True
+        self._built = False
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    def rebuild(self) -> int:
+        with self._lock:
+            self._dirs.clear()
+            self._scan_tree(str(self.root))
+            self._built = True
+            self._dirty = True
+            self._last_refresh = time.monotonic()
+            self._materialize()
+            return len(self._sorted)
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+                return
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            for path in list(self._dirs):
+                entry = self._dirs.get(path)
+                if entry is None:
+                    continue
+                mtime = _dir_mtime(path)
+                if mtime is None:
+                    self._drop_tree(path)
+                elif mtime != entry.mtime_ns:
+                    self._rescan_dir(path)
+            self._last_refresh = time.monotonic()
+
+    def touch(self, directory: Path) -> None:
+        """Re-list one directory, e.g. after a save changed a skeleton status."""
+        with self._lock:
+            if not self._built:
+                return
+            path = str(directory)
+            if path in self._dirs:
+                self._rescan_dir(path)
+            else:
+                self.refresh(force=True)
+
+    def lookup(self, paper_id: str, table_id: str) -> Optional[TableInfo]:
+        """
+        Resolve one table without walking the tree. A hit is confirmed with a
+        single stat of its directory; a miss forces an mtime refresh in case
+        the files were created after the last one.
+        """
+        key = (paper_id, table_id)
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            self._materialize()
+            info = self._by_key.get(key)
+            if info is not None:
+                parent = str(info.csv_path.parent)
+                entry = self._dirs.get(parent)
+                if entry is not None and _dir_mtime(parent) == entry.mtime_ns:
+                    return info
+                self._rescan_dir(parent)
+            else:
+                self.refresh(force=True)
+            self._materialize()
+            return self._by_key.get(key)
+
+    def tables(self) -> List[TableInfo]:
+        with self._lock:
+            self.refresh()
+            self._materialize()
+            return list(self._sorted)
+
+    def _materialize(self) -> None:
+        if not self._dirty:
+            return
+        by_key: Dict[Tuple[str, str], TableInfo] = {}
+        for entry in self._dirs.values():
+            for info in entry.tables:
+                by_key[(info.paper_id, info.table_id)] = info
+        self._by_key = by_key
+        self._sorted = sorted(by_key.values(), key=lambda t: (t.paper_id, t.table_id))
+        self._dirty = False
+
+    def _read_dir(self, path: str) -> Optional[_DirEntry]:
+        mtime = _dir_mtime(path)
+        if mtime is None:
+            return None
+        names = set()
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        directory = Path(path)
+        csv_names = sorted(n for n in names if n.endswith(".csv"))
+        statuses = dir_statuses(directory, csv_names, names)
+        tables: List[TableInfo] = []
+        for name in csv_names:
+            info = build_table_info(directory / name, names, statuses)
+            if info:
+                tables.append(info)
+        return _DirEntry(mtime_ns=mtime, subdirs=sorted(subdirs), tables=tables)
+
+    def _scan_tree(self, path: str) -> None:
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            entry = self._read_dir(current)
+            if entry is None:
+                continue
+            self._dirs[current] = entry
+            stack.extend(d for d in entry.subdirs if d not in self._dirs)
+        self._dirty = True
+
+    def _rescan_dir(self, path: str) -> None:
+        old = self._dirs.get(path)
+        entry = self._read_dir(path)
+        if entry is None:
+            self._drop_tree(path)
+            return
+        self._dirs[path] = entry
+        old_subdirs = set(old.subdirs) if old else set()
+        for sub in old_subdirs - set(entry.subdirs):
+            self._drop_tree(sub)
+        for sub in entry.subdirs:
+            if sub not in self._dirs:
+                self._scan_tree(sub)
+        self._dirty = True
+
+    def _drop_tree(self, path: str) -> None:
+        entry = self._dirs.pop(path, None)
+        if entry is None:
+            return
+        for sub in entry.subdirs:
+            self._drop_tree(sub)
+        self._dirty = True
+
+
+_indexes: Dict[str, TableIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_table_index(root_dir: Path, refresh_interval: float = 2.0) -> TableIndex:
+    key = str(Path(root_dir).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = TableIndex(Path(key), refresh_interval=refresh_interval)
+            _indexes[key] = index
+        return index
+
+
+SORT_KEYS = {
+    "paper_id": lambda t: (t.paper_id, t.table_id),
+    "table_id": lambda t: (t.table_id, t.paper_id),
+    "status": lambda t: (t.status, t.paper_id, t.table_id),
+}
+
+
+def filter_tables(
+    tables: List[TableInfo],
+    paper_prefix: Optional[str] = None,
+    paper_id: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    has_image: Optional[bool] = None,
+    has_skeleton: Optional[bool] = None,
+    exclude_statuses: Optional[List[str]] = None,
+) -> List[TableInfo]:
+    wanted = set(statuses) if statuses else None
+    unwanted = set(exclude_statuses or ())
+    out: List[TableInfo] = []
+    for t in tables:
+        if paper_prefix and not t.paper_id.startswith(paper_prefix):
+            continue
+        if paper_id is not None and t.paper_id != paper_id:
+            continue
+        if wanted is not None and t.status not in wanted:
+            continue
+        if t.status in unwanted:
+            continue
+        if has_image is not None and (t.image_path is not None) != has_image:
+            continue
+        if has_skeleton is not None and (t.skeleton_path is not None) != has_skeleton:
+            continue
+        out.append(t)
+    return out
+
+
+def summarize_tables(tables: List[TableInfo]) -> Dict[str, object]:
+    by_status: Dict[str, int] = {}
+    by_paper: Dict[str, Dict[str, object]] = {}
+    for t in tables:
+        by_status[t.status] = by_status.get(t.status, 0) + 1
+        paper = by_paper.setdefault(t.paper_id, {"total": 0, "by_status": {}})
+        paper["total"] += 1
+        paper["by_status"][t.status] = paper["by_status"].get(t.status, 0) + 1
+    return {"total": len(tables), "by_status": by_status, "by_paper": by_paper}
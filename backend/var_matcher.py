@@ -0,0 +1,219 @@
+"""
+Local label -> dataset column matching, for pre-filling / checking
+data_var_name without an LLM round trip.
+
+Labels and column names are normalized to canonical tokens (snake / camel
+case split, plurals stripped, common abbreviations expanded, "t-1" -> lag,
+"1(...)" indicator wrappers and "×" interactions handled). Each side is then
+embedded as a hashed, IDF-weighted vector of character trigrams plus a hashed
+token vector, and a whole table's labels are scored against every column
+with one matrix product.
+"""
+import hashlib
+import json
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TRIGRAM_DIMS = 1024
+TOKEN_DIMS = 512
+# share of the score coming from trigram vs whole-token similarity
+TRIGRAM_WEIGHT = 0.6
+EXACT_BONUS = 0.25
+# tie-break among exact matches: same characters ignoring case / punctuation
+VERBATIM_BONUS = 0.05
+
+# generic, unambiguous expansions only; paper-specific ones (e.g. "pos" ->
+# "post office") go in <paper-dir>/var_abbreviations.json
+ABBREVIATIONS: Dict[str, str] = {
+    "fin": "financial",
+    "finl": "financial",
+    "gr": "growth",
+    "grw": "growth",
+    "num": "number",
+    "nr": "number",
+    "obs": "observation",
+    "indus": "industry",
+    "pop": "population",
+    "emp": "employment",
+    "empl": "employment",
+    "lev": "leverage",
+    "ln": "log",
+    "yr": "year",
+    "mkt": "market",
+    "avg": "average",
+    "pct": "percent",
+    "perc": "percent",
+    "fe": "fixed",
+    "dummy": "indicator",
+}
+
+ABBREVIATIONS_NAME = "var_abbreviations.json"
+
+# stop words that carry no signal in either labels or column names
+STOPWORDS = {"of", "the", "and", "in", "for", "to", "a", "on", "by", "at", "effects", "effect", "t"}
+
+_CAMEL = re.compile(r"(?<=[a-z])(?=[A-Z])")
+_LAG = re.compile(r"\bt\s*[-−–]\s*(\d+)")
+_LEAD = re.compile(r"\bt\s*\+\s*(\d+)")
+_STATA_LAG = re.compile(r"\b[lL](\d*)\.")
+_INDICATOR = re.compile(r"(?:^|(?<=[\s×*#]))1\s*\(([^()]*)\)")
+_INTERACTION = re.compile(r"\s*(?:×|\*|#|\bx\b)\s*")
+_WORD = re.compile(r"[a-z]+|\d+")
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def load_abbreviations(paper_root: Path) -> Dict[str, str]:
+    """Per-paper {"abbr": "expansion"} from <paper_root>/var_abbreviations.json; {} if absent or invalid."""
+    try:
+        raw = json.loads((Path(paper_root) / ABBREVIATIONS_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(raw, dict):
+        return {}
+    return {str(k).lower(): str(v).lower() for k, v in raw.items() if str(k).strip() and str(v).strip()}
+
+
+def normalize(text: str, abbreviations: Optional[Dict[str, str]] = None) -> List[str]:
+    """Canonical tokens of a table label or a column name (abbreviations default to ABBREVIATIONS)."""
+    abbreviations = ABBREVIATIONS if abbreviations is None else abbreviations
+    text = _CAMEL.sub(" ", text or "")
+    text = _LAG.sub(r" lag \1 ", text)
+    text = _LEAD.sub(r" lead \1 ", text)
+    text = _STATA_LAG.sub(lambda m: f" lag {m.group(1) or 1} ", text)
+    text = _INDICATOR.sub(r" \1 ", text)
+    text = _INTERACTION.sub(" x ", text)
+    tokens: List[str] = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        word = abbreviations.get(word, word)
+        for part in word.split():
+            tokens.append(_singular(part))
+    return tokens
+
+
+def _compact(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+
+def _bucket(feature: str, dims: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dims
+
+
+def _trigrams(tokens: Sequence[str]) -> List[str]:
+    grams = []
+    for tok in tokens:
+        if tok.isdigit() or tok == "x":
+            grams.append(tok)
+            continue
+        padded = f"^{tok}$"
+        grams.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class VarMatcher:
+    """
+    Top-k dataset columns for each label; build once per column set (see
+    get_matcher). `abbreviations` extend / override ABBREVIATIONS.
+    """
+
+    def __init__(self, columns: Sequence[str], abbreviations: Optional[Dict[str, str]] = None) -> None:
+        self.columns = list(dict.fromkeys(c for c in columns if c))
+        self.abbreviations = {**ABBREVIATIONS, **(abbreviations or {})}
+        self._tokens = [normalize(c, self.abbreviations) for c in self.columns]
+        self._exact: Dict[str, List[int]] = {}
+        self._verbatim: Dict[str, List[int]] = {}
+        for i, (name, toks) in enumerate(zip(self.columns, self._tokens)):
+            self._exact.setdefault(" ".join(toks), []).append(i)
+            self._verbatim.setdefault(_compact(name), []).append(i)
+        counts = self._counts(self._tokens)
+        df = (counts[:, :TRIGRAM_DIMS] > 0).sum(axis=0)
+        self._idf = np.log((1 + len(self.columns)) / (1 + df)).astype(np.float32) + 1.0
+        self._matrix = self._embed(counts)
+
+    def _counts(self, token_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        counts = np.zeros((len(token_lists), TRIGRAM_DIMS + TOKEN_DIMS), dtype=np.float32)
+        for row, toks in enumerate(token_lists):
+            for gram in _trigrams(toks):
+                counts[row, _bucket(gram, TRIGRAM_DIMS)] += 1
+            for tok in set(toks):
+                counts[row, TRIGRAM_DIMS + _bucket(tok, TOKEN_DIMS)] = 1
+        return counts
+
+    def _embed(self, counts: np.ndarray) -> np.ndarray:
+        """Row-wise: sqrt(w) * unit trigram tf-idf block, sqrt(1 - w) * unit token block."""
+        grams = counts[:, :TRIGRAM_DIMS] * self._idf
+        toks = counts[:, TRIGRAM_DIMS:]
+        grams /= np.maximum(np.linalg.norm(grams, axis=1, keepdims=True), 1e-9)
+        toks = toks / np.maximum(np.linalg.norm(toks, axis=1, keepdims=True), 1e-9)
+        return np.hstack([grams * np.sqrt(TRIGRAM_WEIGHT), toks * np.sqrt(1 - TRIGRAM_WEIGHT)]).astype(np.float32)
+
+    def scores(self, labels: Sequence[str]) -> np.ndarray:
+        """
+        (len(labels), len(columns)) cosine similarities; exact canonical
+        matches get a bonus, so the best can exceed 1 (match() caps at 1).
+        """
+        if not self.columns or not labels:
+            return np.zeros((len(labels), len(self.columns)), dtype=np.float32)
+        token_lists = [normalize(label, self.abbreviations) for label in labels]
+        sims = self._embed(self._counts(token_lists)) @ self._matrix.T
+        for row, (label, toks) in enumerate(zip(labels, token_lists)):
+            if not toks:
+                continue
+            for col in self._exact.get(" ".join(toks), ()):
+                sims[row, col] += EXACT_BONUS
+            for col in self._verbatim.get(_compact(label), ()):
+                sims[row, col] += VERBATIM_BONUS
+        return sims
+
+    def match(self, labels: Sequence[str], k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Best k (column, score in [0, 1]) per label, highest first; empty labels get no candidates."""
+        sims = self.scores(labels)
+        k = min(k, len(self.columns))
+        out: List[List[Tuple[str, float]]] = []
+        for row, label in enumerate(labels):
+            if k <= 0 or not (label or "").strip():
+                out.append([])
+                continue
+            top = np.argpartition(-sims[row], k - 1)[:k]
+            top = top[np.argsort(-sims[row, top], kind="stable")]
+            out.append([(self.columns[i], round(min(float(sims[row, i]), 1.0), 3)) for i in top if sims[row, i] > 0])
+        return out
+
+    def best(self, label: str, min_score: float = 0.6) -> Optional[Tuple[str, float]]:
+        candidates = self.match([label], k=1)[0]
+        return candidates[0] if candidates and candidates[0][1] >= min_score else None
+
+
+_matchers: "OrderedDict[str, VarMatcher]" = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(columns: Sequence[str], abbreviations: Optional[Dict[str, str]] = None, keep: int = 8) -> VarMatcher:
+    """VarMatcher for this column set and abbreviations, reused while both are unchanged (the last `keep`)."""
+    extra = json.dumps(abbreviations or {}, sort_keys=True)
+    key = hashlib.sha1(("\n".join(columns) + "\0" + extra).encode("utf-8")).hexdigest()
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is not None:
+            _matchers.move_to_end(key)
+            return matcher
+    matcher = VarMatcher(columns, abbreviations)
+    with _matchers_lock:
+        _matchers[key] = matcher
+        while len(_matchers) > keep:
+            _matchers.popitem(last=False)
+    return matcher
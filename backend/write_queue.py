@@ -0,0 +1,102 @@
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from .file_utils import table_lock
+
+
+class WriteBehindQueue:
+    """
+    Coalesces bursts of saves to the same table. `submit` keeps only the latest
+    write per (table, kind) and runs it `window` seconds after the first one of
+    the burst, on a background thread. A write is popped and run while holding
+    the table lock, so a `flush` from a reader can never be overtaken by an
+    older write. With window <= 0 every write runs immediately.
+
+    Readers of a table call `flush(path)` first; `close` flushes everything and
+    is called on shutdown.
+    """
+
+    def __init__(self, window: float = 0.0) -> None:
+        self.window = window
+        # (lock path, kind) -> (deadline, write)
+        self._pending: Dict[Tuple[str, str], Tuple[float, Callable[[], None]]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.submitted = self.written = self.coalesced = 0
+
+    def submit(self, lock_path: Path, kind: str, write: Callable[[], None]) -> bool:
+        """Queue `write`; returns False when it already ran synchronously."""
+        if self.window <= 0 or self._closed:
+            with table_lock(lock_path):
+                write()
+            return False
+        key = (str(Path(lock_path).resolve()), kind)
+        with self._cond:
+            self.submitted += 1
+            previous = self._pending.get(key)
+            if previous is not None:
+                self.coalesced += 1
+            deadline = previous[0] if previous else time.monotonic() + self.window
+            self._pending[key] = (deadline, write)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def _run_key(self, key: Tuple[str, str]) -> bool:
+        with table_lock(Path(key[0])):
+            with self._cond:
+                item = self._pending.pop(key, None)
+            if item is None:
+                return False
+            try:
+                item[1]()
+                self.written += 1
+            except Exception:
+                traceback.print_exc()
+            return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    due = [k for k, (deadline, _) in self._pending.items() if deadline <= now]
+                    if due:
+                        break
+                    timeout = min((d for d, _ in self._pending.values()), default=now + 3600) - now
+                    self._cond.wait(timeout=max(timeout, 0.001))
+                if self._closed:
+                    return
+            for key in due:
+                self._run_key(key)
+
+    def flush(self, lock_path: Optional[Path] = None) -> int:
+        """Run pending writes now (all of them, or those of one table); returns how many ran."""
+        with self._cond:
+            if not self._pending:
+                return 0
+            target = str(Path(lock_path).resolve()) if lock_path is not None else None
+            keys = [k for k in self._pending if target is None or k[0] == target]
+        return sum(self._run_key(key) for key in keys)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "window_ms": self.window * 1000,
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "written": self.written,
+                "coalesced": self.coalesced,
+            }
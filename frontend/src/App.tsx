@@ -1,22 +1,32 @@
-import React, { useEffect, useMemo, useState } from "react";
+import React, { useEffect, useMemo, useRef, useState } from "react";
 import {
+  fetchProjectPage,
+  fetchProjectSummary,
   fetchProjects,
   fetchTableDetail,
   fetchPaperContext,
   getConfig,
   imageUrl,
+  prefetchTables,
+  screenVariant,
+  diffGrid,
+  patchCsv,
   saveCsv,
   saveSkeleton,
   suggestGrid,
   updateConfig,
+  GridData,
   SkeletonModel,
   TableDetail,
   TableListItem,
+  TableRef,
+  ProjectPage,
+  ProjectSummary,
   PaperContext,
   docUrl,
   refreshPaperColumns
 } from "./api";
-import ProjectList from "./components/ProjectList";
+import ProjectList, { ListFilter, PAGE_SIZE, listQuery } from "./components/ProjectList";
 import StatusRail from "./components/StatusRail";
 import ImagePanel from "./components/ImagePanel";
 import EditTable from "./components/EditTable";
@@ -29,7 +39,15 @@ const getRowId = (row: string[], idx: number) => {
 function App() {
   const [rootDir, setRootDir] = useState("");
   const [dataRootDir, setDataRootDir] = useState("");
-  const [projects, setProjects] = useState<TableListItem[]>([]);
+  const [listPage, setListPage] = useState<ProjectPage | null>(null);
+  const [listSummary, setListSummary] = useState<ProjectSummary | null>(null);
+  const [listFilter, setListFilter] = useState<ListFilter>({ paperPrefix: "", status: "all" });
+  const [listOffset, setListOffset] = useState(0);
+  const listRequest = useRef(0);
+  // every table of the open paper, for the status rail (independent of the list page and filters)
+  const [paperTables, setPaperTables] = useState<TableListItem[]>([]);
+  // the image panel and the prefetch use a screen-sized webp; "打开大图" shows the original
+  const variant = useMemo(() => screenVariant(), []);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -39,6 +57,8 @@ function App() {
 
   const [editMode, setEditMode] = useState(false);
   const [gridDraft, setGridDraft] = useState<string[][]>([]);
+  // what the CSV on disk holds (raw header, padded rows) and its version, to save edits as patches
+  const [csvBase, setCsvBase] = useState<{ grid: GridData; version: string | null } | null>(null);
   const [skeletonDraft, setSkeletonDraft] = useState<SkeletonModel | null>(null);
   const [paperContext, setPaperContext] = useState<PaperContext | null>(null);
 
@@ -60,15 +80,6 @@ function App() {
   const [apiKey, setApiKey] = useState("");
   const [apiKeySet, setApiKeySet] = useState(false);
 
-  const sortedProjects = useMemo(
-    () =>
-      [...projects].sort((a, b) => {
-        if (a.paper_id === b.paper_id) return a.table_id.localeCompare(b.table_id);
-        return a.paper_id.localeCompare(b.paper_id);
-      }),
-    [projects]
-  );
-
   useEffect(() => {
     const savedDataRoot = localStorage.getItem("dataRootDir") || "";
     getConfig()
@@ -90,12 +101,12 @@ function App() {
     setError(null);
     setSelected(null);
     setDetail(null);
+    setCsvBase(null);
     setEditMode(false);
     setGridDirty(false);
     setSkeletonDirty(false);
     try {
-      const list = await fetchProjects(rootDir);
-      setProjects(list);
+      await fetchList(listFilter, 0);
     } catch (err: any) {
       setError(err.message || "加载失败");
     } finally {
@@ -103,20 +114,67 @@ function App() {
     }
   };
 
-  const refreshProjects = async () => {
+  // one page of the list plus the status counts, both filtered on the server
+  const fetchList = async (filter: ListFilter, offset: number): Promise<void> => {
+    const query = listQuery(filter);
+    const request = ++listRequest.current;
+    const [page, summary] = await Promise.all([
+      fetchProjectPage(rootDir, { ...query, offset, limit: PAGE_SIZE }),
+      fetchProjectSummary(rootDir, { paper_prefix: query.paper_prefix })
+    ]);
+    // a newer filter / page request has been sent meanwhile (e.g. while typing a prefix)
+    if (request !== listRequest.current) return;
+    if (!page.items.length && offset > 0) {
+      // the page emptied (e.g. its tables were marked done): show the last one instead
+      return fetchList(filter, Math.max(0, Math.ceil(page.total / PAGE_SIZE) - 1) * PAGE_SIZE);
+    }
+    setListFilter(filter);
+    setListOffset(offset);
+    setListPage(page);
+    setListSummary(summary);
+  };
+
+  const changeList = async (filter: ListFilter, offset: number) => {
+    setListFilter(filter);
     try {
-      const list = await fetchProjects(rootDir);
-      setProjects(list);
-      return list;
+      await fetchList(filter, offset);
     } catch (err: any) {
       setError(err.message || "加载失败");
-      return projects;
     }
   };
 
+  const loadPaperTables = (paperId: string) =>
+    fetchProjects(rootDir, { paper_id: paperId })
+      .then((items) => setPaperTables(items))
+      .catch(() => setPaperTables([]));
+
+  const refreshProjects = () => {
+    if (selected) loadPaperTables(selected.paper_id);
+    return changeList(listFilter, listOffset);
+  };
+
+  // the next k unfinished tables after `current` in list order, wrapping around to the start
+  const nextUnfinished = async (current: TableRef, k: number): Promise<TableListItem[]> => {
+    const after = await fetchProjects(rootDir, {
+      exclude_status: ["done"],
+      after_paper_id: current.paper_id,
+      after_table_id: current.table_id,
+      limit: k
+    });
+    if (after.length >= k) return after;
+    const seen = new Set([current, ...after].map((t) => `${t.paper_id}/${t.table_id}`));
+    const wrapped = await fetchProjects(rootDir, { exclude_status: ["done"], limit: 2 * k + 1 });
+    return [...after, ...wrapped.filter((t) => !seen.has(`${t.paper_id}/${t.table_id}`))].slice(0, k);
+  };
+
   const openDetail = async (item: TableListItem, toEdit: boolean) => {
+    if (item.paper_id !== selected?.paper_id) {
+      setPaperTables([]);
+      loadPaperTables(item.paper_id);
+    }
     setSelected(item);
     setDetail(null);
+    setCsvBase(null);
     setDetailError(null);
     setEditMode(toEdit);
     setGridDirty(false);
@@ -135,17 +193,27 @@ function App() {
         return row.slice(0, maxLen);
       });
       setDetail({ ...data, grid: { ...data.grid, header, rows: fixedRows } });
+      setCsvBase({ grid: { header: data.grid.header, rows: fixedRows }, version: data.grid_version ?? null });
       setGridDraft(fixedRows);
       setSkeletonDraft(structuredClone(data.skeleton));
       fetchPaperContext(item.paper_id, dataRootDir || rootDir)
         .then((ctx) => setPaperContext(ctx))
         .catch(() => setPaperContext(null));
+      // warm the server caches and the browser image cache for "save and next" (which skips done tables)
+      nextUnfinished(item, 3)
+        .then((next) => prefetchTables(next, rootDir, variant))
+        .then((next) => next.slice(0, 1).forEach((t) => (new Image().src = imageUrl(t.paper_id, t.table_id, rootDir, variant))))
+        .catch(() => undefined);
     } catch (err: any) {
       setDetailError(err.message || "加载失败");
     }
   };
 
   const imageSrc = useMemo(() => {
+    if (!selected) return "";
+    return imageUrl(selected.paper_id, selected.table_id, rootDir, variant);
+  }, [selected, rootDir, variant]);
+  const fullImageSrc = useMemo(() => {
     if (!selected) return "";
     return imageUrl(selected.paper_id, selected.table_id, rootDir);
   }, [selected, rootDir]);
@@ -165,22 +233,26 @@ function App() {
     setSavingSkeleton(true);
     setSaveMsg(null);
     try {
-      await saveCsv(detail.info.paper_id, detail.info.table_id, rootDir, {
-        header: detail.grid.header,
-        rows: gridDraft
-      });
+      const ops = csvBase?.version ? diffGrid(csvBase.grid, detail.grid.header, gridDraft) : null;
+      let version: string | null;
+      if (ops && csvBase?.version) {
+        version = ops.length
+          ? await patchCsv(detail.info.paper_id, detail.info.table_id, rootDir, csvBase.version, ops)
+          : csvBase.version;
+      } else {
+        version = await saveCsv(detail.info.paper_id, detail.info.table_id, rootDir, {
+          header: detail.grid.header,
+          rows: gridDraft
+        });
+      }
+      setCsvBase({ grid: { header: detail.grid.header, rows: gridDraft }, version });
       await saveSkeleton(detail.info.paper_id, detail.info.table_id, rootDir, skeletonDraft);
       setSaveMsg(andNext ? "已保存，自动跳转..." : "已保存全部");
       setGridDirty(false);
       setSkeletonDirty(false);
       if (andNext) {
-        const list = await refreshProjects();
-        const currentIndex = list.findIndex(
-          (p) => p.paper_id === detail.info.paper_id && p.table_id === detail.info.table_id
-        );
-        const next =
-          list.slice(currentIndex + 1).find((p) => p.status !== "done") ||
-          list.find((p) => p.status !== "done" && !(p.paper_id === detail.info.paper_id && p.table_id === detail.info.table_id));
+        refreshProjects();
+        const [next] = await nextUnfinished(detail.info, 1);
         if (next) {
           await openDetail(next, true);
         } else {
@@ -299,17 +371,12 @@ function App() {
       setSkeletonDraft(payload);
       setDetail((prev) => (prev ? { ...prev, skeleton: { ...prev.skeleton, status } } : prev));
       setSelected((prev) => (prev ? { ...prev, status } : prev));
-      const list = await refreshProjects();
+      refreshProjects();
       setSaveMsg(status === "done" ? "已标记完成" : "已标记未完成");
       setGridDirty(false);
       setSkeletonDirty(false);
       if (status === "done") {
-        const currentIndex = list.findIndex(
-          (p) => p.paper_id === detail.info.paper_id && p.table_id === detail.info.table_id
-        );
-        const next =
-          list.slice(currentIndex + 1).find((p) => p.status !== "done") ||
-          list.find((p) => p.status !== "done" && !(p.paper_id === detail.info.paper_id && p.table_id === detail.info.table_id));
+        const [next] = await nextUnfinished(detail.info, 1);
         if (next) {
           await openDetail(next, true);
         } else {
@@ -510,7 +577,12 @@ function App() {
       </div>
 
       <ProjectList
-        projects={sortedProjects}
+        rootDir={rootDir}
+        page={listPage}
+        summary={listSummary}
+        filter={listFilter}
+        onFilterChange={(filter) => changeList(filter, 0)}
+        onPageChange={(offset) => changeList(listFilter, offset)}
         onEdit={(item) => openDetail(item, true)}
         onView={(item) => openDetail(item, false)}
         onMarkDone={(item) => openDetail(item, editMode).then(() => updateStatusOnly("done"))}
@@ -523,7 +595,7 @@ function App() {
                   <div style={{ fontWeight: 700, fontSize: 18 }}>
                     {selected.paper_id} / {selected.table_id}
                   </div>
-                  <StatusRail projects={sortedProjects} selected={selected} onJump={attemptJump} />
+                  <StatusRail projects={paperTables} selected={selected} onJump={attemptJump} />
                 </div>
 
           {detailError && <div style={{ color: "#b91c1c" }}>{detailError}</div>}
@@ -621,7 +693,7 @@ function App() {
               </button>
             </div>
             <div className="modal-image-wrap">
-              <img src={imageSrc} alt="full" />
+              <img src={fullImageSrc} alt="full" />
             </div>
           </div>
         </div>
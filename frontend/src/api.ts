@@ -36,6 +36,7 @@ export type TableDetail = {
   info: TableListItem;
   grid: GridData;
   skeleton: SkeletonModel;
+  grid_version?: string | null;
 };
 
 export type AppConfig = {
@@ -74,14 +75,71 @@ export async function updateConfig(cfg: Partial<AppConfig> & { openai_api_key?:
   return res.json();
 }
 
-export async function fetchProjects(rootDir: string): Promise<TableListItem[]> {
-  const res = await fetch(withRoot("/api/projects", rootDir));
+export type ProjectQuery = {
+  offset?: number;
+  limit?: number;
+  paper_prefix?: string;
+  paper_id?: string;
+  status?: string[];
+  exclude_status?: string[];
+  has_image?: boolean;
+  has_skeleton?: boolean;
+  sort?: "paper_id" | "table_id" | "status";
+  order?: "asc" | "desc";
+  // only rows sorted after this table
+  after_paper_id?: string;
+  after_table_id?: string;
+};
+
+export type ProjectPage = {
+  total: number;
+  offset: number;
+  limit: number | null;
+  next_offset: number | null;
+  items: TableListItem[];
+};
+
+export type ProjectSummary = {
+  total: number;
+  by_status: Record<string, number>;
+  by_paper: Record<string, { total: number; by_status: Record<string, number> }>;
+};
+
+const projectQueryString = (query: ProjectQuery) => {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value === undefined || value === null || value === "") return;
+    if (Array.isArray(value)) {
+      value.forEach((v) => params.append(key, String(v)));
+    } else {
+      params.append(key, String(value));
+    }
+  });
+  const qs = params.toString();
+  return qs ? `?${qs}` : "";
+};
+
+export async function fetchProjectPage(rootDir: string, query: ProjectQuery = {}): Promise<ProjectPage> {
+  const res = await fetch(withRoot(`/api/projects${projectQueryString(query)}`, rootDir));
   if (!res.ok) {
     throw new Error("Failed to load projects");
   }
   return res.json();
 }
 
+export async function fetchProjects(rootDir: string, query: ProjectQuery = {}): Promise<TableListItem[]> {
+  const page = await fetchProjectPage(rootDir, query);
+  return page.items;
+}
+
+export async function fetchProjectSummary(rootDir: string, query: ProjectQuery = {}): Promise<ProjectSummary> {
+  const res = await fetch(withRoot(`/api/projects/summary${projectQueryString(query)}`, rootDir));
+  if (!res.ok) {
+    throw new Error("Failed to load project summary");
+  }
+  return res.json();
+}
+
 export async function fetchTableDetail(
   paperId: string,
   tableId: string,
@@ -94,12 +152,30 @@ export async function fetchTableDetail(
   return res.json();
 }
 
-export function imageUrl(paperId: string, tableId: string, rootDir: string): string {
-  return withRoot(`/api/table/${paperId}/${tableId}/image`, rootDir);
+export type ImageVariant = { w?: number; format?: "png" | "webp" | "jpeg" };
+
+// small preview for the project list
+export const THUMB_VARIANT: ImageVariant = { w: 240, format: "webp" };
+
+// as wide as the screen can show (in device pixels), rounded up to 400 px steps so the server cache is shared
+export function screenVariant(): ImageVariant {
+  const px = Math.ceil((window.innerWidth || 1600) * (window.devicePixelRatio || 1));
+  return { w: Math.min(4000, Math.ceil(px / 400) * 400), format: "webp" };
+}
+
+export function imageUrl(paperId: string, tableId: string, rootDir: string, variant: ImageVariant = {}): string {
+  const params = new URLSearchParams();
+  if (variant.w) params.set("w", String(variant.w));
+  if (variant.format) params.set("format", variant.format);
+  const qs = params.toString();
+  return withRoot(`/api/table/${paperId}/${tableId}/image${qs ? `?${qs}` : ""}`, rootDir);
 }
 
 export type PaperContext = {
   columns: string[];
+  columns_stale?: boolean;
+  stale_files?: { added: string[]; changed: string[]; removed: string[] };
+  column_sources?: Record<string, string[]>;
   pdfs: string[];
   code_docs: string[];
 };
@@ -112,7 +188,42 @@ export async function fetchPaperContext(paperId: string, rootDir: string): Promi
   return res.json();
 }
 
-export async function refreshPaperColumns(paperId: string, rootDir: string): Promise<string[]> {
+export type Job<T = any> = {
+  job_id: string;
+  kind: string;
+  status: "queued" | "running" | "done" | "failed";
+  progress: Record<string, number>;
+  result: T | null;
+  error: string | null;
+};
+
+export async function fetchJob<T = any>(jobId: string): Promise<Job<T>> {
+  const res = await fetch(`/api/jobs/${jobId}`);
+  if (!res.ok) {
+    throw new Error("Failed to load job");
+  }
+  return res.json();
+}
+
+export async function waitForJob<T = any>(
+  jobId: string,
+  onProgress?: (job: Job<T>) => void,
+  intervalMs = 1000
+): Promise<T> {
+  for (;;) {
+    const job = await fetchJob<T>(jobId);
+    onProgress?.(job);
+    if (job.status === "done") return job.result as T;
+    if (job.status === "failed") throw new Error(job.error || "任务失败");
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
+export async function refreshPaperColumns(
+  paperId: string,
+  rootDir: string,
+  onProgress?: (job: Job) => void
+): Promise<string[]> {
   const res = await fetch(withRoot(`/api/paper/${paperId}/refresh_columns`, rootDir), {
     method: "POST"
   });
@@ -120,8 +231,9 @@ export async function refreshPaperColumns(paperId: string, rootDir: string): Pro
     const msg = await res.text();
     throw new Error(msg || "刷新列名失败");
   }
-  const data = await res.json();
-  return data.columns || [];
+  const job: Job = await res.json();
+  const result = await waitForJob<{ columns: string[] }>(job.job_id, onProgress);
+  return result?.columns || [];
 }
 
 export function docUrl(paperId: string, relativePath: string, rootDir: string): string {
@@ -129,12 +241,31 @@ export function docUrl(paperId: string, relativePath: string, rootDir: string):
   return withRoot(`/api/paper/${paperId}/doc?path=${encoded}`, rootDir);
 }
 
+export type TableRef = { paper_id: string; table_id: string };
+
+// warm the server caches for the tables about to be opened (at most 20)
+export async function prefetchTables(tables: TableRef[], rootDir: string, variant: ImageVariant = {}): Promise<TableRef[]> {
+  if (!tables.length) return [];
+  const res = await fetch(withRoot("/api/prefetch", rootDir), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      tables: tables.slice(0, 20).map((t) => ({ paper_id: t.paper_id, table_id: t.table_id })),
+      image_w: variant.w,
+      image_format: variant.format
+    })
+  });
+  if (!res.ok) return [];
+  const data = await res.json();
+  return data.scheduled || [];
+}
+
 export async function saveCsv(
   paperId: string,
   tableId: string,
   rootDir: string,
   grid: GridData
-): Promise<void> {
+): Promise<string | null> {
   const res = await fetch(withRoot(`/api/table/${paperId}/${tableId}/save_csv`, rootDir), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -143,6 +274,54 @@ export async function saveCsv(
   if (!res.ok) {
     throw new Error("保存 CSV 失败");
   }
+  const data = await res.json();
+  return data.version ?? null;
+}
+
+export type GridOp =
+  | { op: "set_cell"; row: number; col: number; value: string }
+  | { op: "set_header"; values: string[] }
+  | { op: "insert_row"; row: number; values?: string[] }
+  | { op: "delete_row"; row: number }
+  | { op: "insert_col"; col: number; value?: string; values?: string[] }
+  | { op: "delete_col"; col: number };
+
+// Cell-level ops turning `base` into header + rows; null when the shape changed (use saveCsv then).
+export function diffGrid(base: GridData, header: string[], rows: string[][]): GridOp[] | null {
+  if (rows.length !== base.rows.length) return null;
+  if (rows.some((row, r) => row.length !== base.rows[r].length)) return null;
+  const ops: GridOp[] = [];
+  if (header.length !== base.header.length || header.some((h, i) => h !== base.header[i])) {
+    ops.push({ op: "set_header", values: header });
+  }
+  rows.forEach((row, r) =>
+    row.forEach((value, c) => {
+      if (value !== base.rows[r][c]) ops.push({ op: "set_cell", row: r, col: c, value });
+    })
+  );
+  return ops;
+}
+
+export async function patchCsv(
+  paperId: string,
+  tableId: string,
+  rootDir: string,
+  baseVersion: string,
+  ops: GridOp[]
+): Promise<string> {
+  const res = await fetch(withRoot(`/api/table/${paperId}/${tableId}/patch_csv`, rootDir), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ base_version: baseVersion, ops })
+  });
+  if (res.status === 409) {
+    throw new Error("CSV 已在别处被修改，请重新加载后再保存");
+  }
+  if (!res.ok) {
+    throw new Error("保存 CSV 失败");
+  }
+  const data = await res.json();
+  return data.version;
 }
 
 export async function saveSkeleton(
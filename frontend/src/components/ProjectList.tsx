@@ -1,44 +1,110 @@
-import React, { useMemo, useState } from "react";
+import React from "react";
 import StatusBadge from "./StatusBadge";
-import { TableListItem } from "../api";
+import { ProjectPage, ProjectQuery, ProjectSummary, TableListItem, THUMB_VARIANT, imageUrl } from "../api";
+
+export type StatusFilter = "all" | "todo" | "in_progress" | "done";
+
+export type ListFilter = {
+  paperPrefix: string;
+  status: StatusFilter;
+};
+
+export const PAGE_SIZE = 20;
+
+// "todo" covers every status other than in_progress / done, like StatusBadge
+export const listQuery = (filter: ListFilter): ProjectQuery => ({
+  paper_prefix: filter.paperPrefix.trim() || undefined,
+  status: filter.status === "in_progress" || filter.status === "done" ? [filter.status] : undefined,
+  exclude_status: filter.status === "todo" ? ["in_progress", "done"] : undefined
+});
 
 type Props = {
-  projects: TableListItem[];
+  rootDir: string;
+  page: ProjectPage | null;
+  summary: ProjectSummary | null;
+  filter: ListFilter;
+  onFilterChange: (filter: ListFilter) => void;
+  onPageChange: (offset: number) => void;
   onEdit: (item: TableListItem) => void;
   onView: (item: TableListItem) => void;
   onMarkDone: (item: TableListItem) => void;
   onMarkInProgress: (item: TableListItem) => void;
 };
 
-const PAGE_SIZE = 20;
-
-const ProjectList = ({ projects, onEdit, onView, onMarkDone, onMarkInProgress }: Props) => {
-  const [page, setPage] = useState(1);
-  const totalPages = Math.max(1, Math.ceil(projects.length / PAGE_SIZE));
+const ProjectList = ({
+  rootDir,
+  page,
+  summary,
+  filter,
+  onFilterChange,
+  onPageChange,
+  onEdit,
+  onView,
+  onMarkDone,
+  onMarkInProgress
+}: Props) => {
+  const items = page?.items || [];
+  const total = page?.total || 0;
+  const offset = page?.offset || 0;
+  const pageNo = Math.floor(offset / PAGE_SIZE) + 1;
+  const totalPages = Math.max(1, Math.ceil(total / PAGE_SIZE));
 
-  const pageItems = useMemo(() => {
-    const start = (page - 1) * PAGE_SIZE;
-    return projects.slice(start, start + PAGE_SIZE);
-  }, [page, projects]);
+  const byStatus = summary?.by_status || {};
+  const doneCount = byStatus.done || 0;
+  const inProgressCount = byStatus.in_progress || 0;
+  const statusTabs: { key: StatusFilter; label: string; count: number }[] = [
+    { key: "all", label: "全部", count: summary?.total || 0 },
+    { key: "todo", label: "未开始", count: (summary?.total || 0) - doneCount - inProgressCount },
+    { key: "in_progress", label: "进行中", count: inProgressCount },
+    { key: "done", label: "完成", count: doneCount }
+  ];
 
   const showWp = (id?: string) => id?.toLowerCase().includes("_wp");
 
   return (
     <div className="card">
-      <div style={{ fontWeight: 700, marginBottom: 8 }}>项目列表</div>
+      <div className="row" style={{ alignItems: "center", gap: 8, flexWrap: "wrap", marginBottom: 8 }}>
+        <div style={{ fontWeight: 700 }}>项目列表</div>
+        {statusTabs.map((tab) => (
+          <button
+            key={tab.key}
+            className={filter.status === tab.key ? "button" : "button secondary"}
+            onClick={() => onFilterChange({ ...filter, status: tab.key })}
+          >
+            {tab.label} {tab.count}
+          </button>
+        ))}
+        <input
+          className="input slim"
+          placeholder="按 paper_id 前缀筛选"
+          value={filter.paperPrefix}
+          onChange={(e) => onFilterChange({ ...filter, paperPrefix: e.target.value })}
+        />
+      </div>
       <div className="grid-preview" style={{ maxHeight: 360 }}>
         <table className="table">
           <thead>
             <tr>
-              <th style={{ width: "24%" }}>paper_id</th>
-              <th style={{ width: "24%" }}>table_id / panel</th>
-              <th style={{ width: "16%" }}>状态</th>
-              <th style={{ width: "36%" }}>操作</th>
+              <th style={{ width: "14%" }}>预览</th>
+              <th style={{ width: "20%" }}>paper_id</th>
+              <th style={{ width: "20%" }}>table_id / panel</th>
+              <th style={{ width: "12%" }}>状态</th>
+              <th style={{ width: "34%" }}>操作</th>
             </tr>
           </thead>
           <tbody>
-            {pageItems.map((item) => (
+            {items.map((item) => (
               <tr key={`${item.paper_id}-${item.table_id}`}>
+                <td>
+                  {item.image_path ? (
+                    <img
+                      className="list-thumb"
+                      loading="lazy"
+                      src={imageUrl(item.paper_id, item.table_id, rootDir, THUMB_VARIANT)}
+                      alt={item.table_id}
+                    />
+                  ) : null}
+                </td>
                 <td>{item.paper_id}</td>
                 <td>
                   {item.table_id}
@@ -69,9 +135,9 @@ const ProjectList = ({ projects, onEdit, onView, onMarkDone, onMarkInProgress }:
                 </td>
               </tr>
             ))}
-            {pageItems.length === 0 && (
+            {items.length === 0 && (
               <tr>
-                <td colSpan={4} style={{ textAlign: "center", padding: 12 }}>
+                <td colSpan={5} style={{ textAlign: "center", padding: 12 }}>
                   暂无数据
                 </td>
               </tr>
@@ -81,16 +147,20 @@ const ProjectList = ({ projects, onEdit, onView, onMarkDone, onMarkInProgress }:
       </div>
       <div className="row" style={{ justifyContent: "space-between", marginTop: 8 }}>
         <div>
-          共 {projects.length} 条 · 第 {page}/{totalPages} 页
+          共 {total} 条 · 第 {pageNo}/{totalPages} 页
         </div>
         <div className="row" style={{ gap: 6, flexWrap: "wrap" }}>
-          <button className="button secondary" disabled={page <= 1} onClick={() => setPage((p) => Math.max(1, p - 1))}>
+          <button
+            className="button secondary"
+            disabled={offset <= 0}
+            onClick={() => onPageChange(Math.max(0, offset - PAGE_SIZE))}
+          >
             上一页
           </button>
           <button
             className="button secondary"
-            disabled={page >= totalPages}
-            onClick={() => setPage((p) => Math.min(totalPages, p + 1))}
+            disabled={page?.next_offset == null}
+            onClick={() => page?.next_offset != null && onPageChange(page.next_offset)}
           >
             下一页
           </button>
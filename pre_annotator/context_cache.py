@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+CACHE_DIR_NAME = ".pre_annotator_cache"
+CACHE_FILE_NAME = "context.json"
+CACHE_VERSION = 1
+
+
+def file_fingerprint(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ContextCache:
+    """
+    Per-paper cache of derived artifacts (column lists, code identifiers,
+    extracted pdf/notes text), keyed by artifact kind and file path and
+    validated against the file's size + mtime.
+
+    Entries that were not looked up during a run are dropped on `save()`,
+    so deleted or renamed files do not accumulate.
+    """
+
+    def __init__(self, paper_root: Path, enabled: bool = True) -> None:
+        self.root = Path(paper_root)
+        self.path = self.root / CACHE_DIR_NAME / CACHE_FILE_NAME
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._seen: Set[str] = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        if enabled:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            self._entries = data.get("entries") or {}
+
+    def _key(self, kind: str, path: Path) -> str:
+        try:
+            rel = str(Path(path).resolve().relative_to(self.root.resolve()))
+        except Exception:
+            rel = str(Path(path).resolve())
+        return f"{kind}::{rel}"
+
+    def get_or_compute(self, kind: str, path: Path, compute: Callable[[], Any]) -> Any:
+        """`compute` must return a JSON-serialisable value."""
+        if not self.enabled:
+            return compute()
+        fp = file_fingerprint(path)
+        if fp is None:
+            return compute()
+        key = self._key(kind, path)
+        with self._lock:
+            self._seen.add(key)
+            entry = self._entries.get(key)
+            if entry and (entry.get("size"), entry.get("mtime_ns")) == fp:
+                self.hits += 1
+                return entry.get("value")
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = {"size": fp[0], "mtime_ns": fp[1], "value": value}
+            self._dirty = True
+        return value
+
+    def save(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            stale = [k for k in self._entries if k not in self._seen]
+            for k in stale:
+                del self._entries[k]
+            if not self._dirty and not stale:
+                return
+            payload = json.dumps({"version": CACHE_VERSION, "entries": self._entries}, ensure_ascii=False)
+            self._dirty = False
+        tmp = self.path.with_name(f"{CACHE_FILE_NAME}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            # read-only paper directories just run uncached
+            pass
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import Dict, List, Optional, Set
 import re
 
+from backend.column_readers import DEFAULT_MAX_FULL_READ_BYTES, read_columns
+from backend.paper_scan import CODE_EXTS, PaperFiles, paper_pdfs, scan_paper_dir, within
+from backend.var_matcher import load_abbreviations
+
+from .context_cache import ContextCache
+from .pdf_text import PdfTextService, get_pdf_service
+
 SUPPORTED_IMAGE_EXTS = {".png", ".jpg", ".jpeg"}
-SUPPORTED_CODE_EXTS = {".py", ".r", ".jl", ".m", ".sas", ".do", ".ado", ".qmd", ".ipynb"}
-DOC_EXTS = {".pdf", ".md", ".txt"}
-DATA_EXTS = {".csv", ".tsv", ".dta", ".sav", ".sas7bdat", ".rds", ".rdata", ".feather", ".parquet", ".xlsx", ".xls", ".pkl"}
+SUPPORTED_CODE_EXTS = CODE_EXTS
 
 
 @dataclass
@@ -21,45 +26,57 @@ class ProjectContext:
     candidate_code_vars: Set[str]
     code_text: str
     pdf_text: str
+    # paper-specific label abbreviations for the local var matcher
+    var_abbreviations: Dict[str, str] = field(default_factory=dict)
 
 
 class ContextLoader:
-    def __init__(self, project_root: Path) -> None:
+    def __init__(
+        self,
+        project_root: Path,
+        use_cache: bool = True,
+        max_full_read_bytes: Optional[int] = DEFAULT_MAX_FULL_READ_BYTES,
+        pdf_service: Optional[PdfTextService] = None,
+    ) -> None:
         self.root = Path(project_root)
+        self.cache = ContextCache(self.root, enabled=use_cache)
+        self.max_full_read_bytes = max_full_read_bytes
+        self.pdf_service = pdf_service or get_pdf_service()
+        self._files: Optional[PaperFiles] = None
+
+    @property
+    def files(self) -> PaperFiles:
+        """Single scandir pass over the project, shared by the find_* helpers."""
+        if self._files is None:
+            self._files = scan_paper_dir(self.root)
+        return self._files
 
     def find_pdf(self, paper_id: str) -> List[Path]:
         papers_dir = self.root / "papers"
         if papers_dir.exists():
-            pdfs = list(papers_dir.glob(f"nomask_{paper_id}.pdf"))
-            pdfs += [p for p in papers_dir.glob("*.pdf") if p not in pdfs]
-        else:
-            pdfs = list(self.root.glob(f"nomask_{paper_id}.pdf")) + list(self.root.glob("*.pdf"))
-        return pdfs
+            return paper_pdfs(self.files, paper_id)
+        pdfs = within(self.files.pdf, self.root, recursive=False)
+        preferred = [p for p in pdfs if p.name == f"nomask_{paper_id}.pdf"]
+        return preferred + [p for p in pdfs if p not in preferred]
 
     def find_data_files(self) -> List[Path]:
         data_dir = self.root / "data"
-        files: List[Path] = []
-        if data_dir.exists():
-            for ext in DATA_EXTS:
-                files += list(data_dir.rglob(f"*{ext}"))
-        return files
+        if not data_dir.exists():
+            return []
+        return within(self.files.data, data_dir)
 
     def find_code_files(self) -> List[Path]:
         code_dir = self.root / "code"
-        files: List[Path] = []
-        if code_dir.exists():
-            for ext in SUPPORTED_CODE_EXTS:
-                files += [p for p in code_dir.rglob(f"*{ext}") if "log" not in p.name.lower()]
-        return files
+        if not code_dir.exists():
+            return []
+        return [p for p in within(self.files.code, code_dir) if "log" not in p.name.lower()]
 
     def find_notes_files(self) -> List[Path]:
         """Optional doc files (pdf/md/txt) placed with code; keep full text for LLM context."""
         code_dir = self.root / "code"
-        files: List[Path] = []
-        if code_dir.exists():
-            for ext in DOC_EXTS:
-                files += [p for p in code_dir.rglob(f"*{ext}") if "log" not in p.name.lower()]
-        return files
+        if not code_dir.exists():
+            return []
+        return [p for p in within(self.files.docs, code_dir) if "log" not in p.name.lower()]
 
     def load_pdf_text(self, pdf: Optional[Path], limit_chars: int = 12000) -> str:
         if not pdf or not pdf.exists():
@@ -68,86 +85,53 @@ class ContextLoader:
             import pdfplumber
         except Exception:
             return ""
+
         try:
-            texts: List[str] = []
-            with pdfplumber.open(pdf) as doc:
-                for page in doc.pages:
-                    texts.append(page.extract_text() or "")
-                    if sum(len(t) for t in texts) > limit_chars:
-                        break
-            out = "\n".join(texts)
-            return out[:limit_chars]
+            return self.cache.get_or_compute(
+                f"pdf_text:{limit_chars}", pdf, lambda: self.pdf_service.read_text(pdf, limit_chars)
+            )
         except Exception:
             return ""
 
+    def columns_for_file(self, p: Path, limit: int = 50) -> List[str]:
+        """Column names of one data file (schema only where the format allows); raises if unreadable."""
+        cols, _ = read_columns(p, max_sheets=limit, max_full_read_bytes=self.max_full_read_bytes)
+        return cols
+
     def load_columns_from_data(self, paths: List[Path], limit: int = 50) -> Set[str]:
         cols: Set[str] = set()
         for p in paths:
             if len(cols) > 3000:
                 break
-            ext = p.suffix.lower()
             try:
-                if ext in {".csv", ".tsv"}:
-                    import pandas as pd
-                    df = pd.read_csv(p, nrows=0, sep="," if ext == ".csv" else "\t")
-                    cols.update(df.columns.tolist())
-                elif ext in {".xlsx", ".xls"}:
-                    import pandas as pd
-                    xls = pd.ExcelFile(p)
-                    for sheet in xls.sheet_names[:limit]:
-                        df = xls.parse(sheet, nrows=0)
-                        cols.update(df.columns.tolist())
-                elif ext in {".dta", ".sav", ".sas7bdat"}:
-                    import pyreadstat
-                    meta = pyreadstat.read_filemeta(str(p))
-                    cols.update(meta.column_names)
-                elif ext in {".rds", ".rdata"}:
-                    import pyreadr
-                    res = pyreadr.read_r(str(p))
-                    for _, df in res.items():
-                        try:
-                            cols.update(df.columns.tolist())
-                        except Exception:
-                            pass
-                elif ext in {".feather", ".parquet"}:
-                    import pandas as pd
-                    df = pd.read_feather(p, columns=None) if ext == ".feather" else pd.read_parquet(p, columns=None)
-                    cols.update(df.columns.tolist())
-                elif ext == ".pkl":
-                    import pickle
-                    with p.open("rb") as f:
-                        obj = pickle.load(f)
-                    if hasattr(obj, "columns"):
-                        try:
-                            cols.update(obj.columns.tolist())
-                        except Exception:
-                            pass
-                    elif isinstance(obj, dict):
-                        for v in obj.values():
-                            if hasattr(v, "columns"):
-                                try:
-                                    cols.update(v.columns.tolist())
-                                except Exception:
-                                    pass
-                if len(cols) > 3000:
-                    cols = set(list(cols)[:3000])
+                file_cols = self.cache.get_or_compute(f"columns:{limit}", p, lambda p=p: self.columns_for_file(p, limit))
             except Exception:
                 continue
+            cols.update(file_cols)
+            if len(cols) > 3000:
+                cols = set(list(cols)[:3000])
         return cols
 
+    def code_vars_for_file(self, p: Path, limit_chars: int = 8000) -> List[str]:
+        pat = re.compile(r"[A-Za-z_][A-Za-z0-9_\\.]*")
+        txt = p.read_text(encoding="utf-8", errors="ignore")[:limit_chars]
+        names: Set[str] = set()
+        for m in pat.finditer(txt):
+            name = m.group(0)
+            if len(name) <= 60 and not name.isdigit():
+                names.add(name)
+        return sorted(names)
+
     def parse_code_vars(self, paths: List[Path], limit_chars: int = 8000) -> Set[str]:
         vars: Set[str] = set()
-        pat = re.compile(r"[A-Za-z_][A-Za-z0-9_\\.]*")
         for p in paths:
             try:
-                txt = p.read_text(encoding="utf-8", errors="ignore")
+                file_vars = self.cache.get_or_compute(
+                    f"code_vars:{limit_chars}", p, lambda p=p: self.code_vars_for_file(p, limit_chars)
+                )
             except Exception:
                 continue
-            txt = txt[:limit_chars]
-            for m in pat.finditer(txt):
-                name = m.group(0)
-                if len(name) <= 60 and not name.isdigit():
-                    vars.add(name)
+            vars.update(file_vars)
             if len(vars) > 3000:
                 break
         return vars
@@ -175,15 +159,9 @@ class ContextLoader:
             ext = p.suffix.lower()
             try:
                 if ext == ".pdf":
-                    import pdfplumber
-
-                    parts: List[str] = []
-                    with pdfplumber.open(p) as doc:
-                        for page in doc.pages:
-                            parts.append(page.extract_text() or "")
-                            if sum(len(t) for t in parts) > max_chars:
-                                break
-                    txt = "\n".join(parts)
+                    txt = self.cache.get_or_compute(
+                        f"notes_pdf:{max_chars}", p, lambda p=p: self.pdf_service.read_text(p, max_chars)
+                    )
                 else:
                     txt = p.read_text(encoding="utf-8", errors="ignore")
             except Exception:
@@ -205,6 +183,7 @@ class ContextLoader:
         code_text = self.load_code_text(code_files)
         doc_text = self.load_notes_text(note_files)
         combined_code_text = code_text + ("\n\n### DOC NOTES ###\n" + doc_text if doc_text else "")
+        self.cache.save()
         return ProjectContext(
             paper_id=paper_id,
             pdf_path=pdfs[0] if pdfs else None,
@@ -214,6 +193,7 @@ class ContextLoader:
             candidate_code_vars=code_vars,
             code_text=combined_code_text,
             pdf_text=pdf_text,
+            var_abbreviations=load_abbreviations(self.root),
         )
 
 
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .context_loader import ContextLoader, discover_images
+from .pipeline import BatchStats, ImageJob, process_image
+
+
+@dataclass
+class PaperSpec:
+    paper_id: str
+    paper_dir: Path
+    images_dir: Path
+
+
+def discover_papers(corpus_root: Path, images_subdir: str = "images", images_root: Optional[Path] = None) -> List[PaperSpec]:
+    """Every sub-directory of corpus_root is a paper; images live in <paper>/<images_subdir> or <images_root>/<paper>."""
+    papers: List[PaperSpec] = []
+    for paper_dir in sorted(p for p in Path(corpus_root).iterdir() if p.is_dir() and not p.name.startswith(".")):
+        images_dir = Path(images_root) / paper_dir.name if images_root else paper_dir / images_subdir
+        if images_dir.exists():
+            papers.append(PaperSpec(paper_id=paper_dir.name, paper_dir=paper_dir, images_dir=images_dir))
+    return papers
+
+
+def read_manifest(path: Path, images_subdir: str = "images") -> List[PaperSpec]:
+    """
+    One paper per line, either JSON ({"paper_dir": ..., "images_dir": ..., "paper_id": ...})
+    or tab-separated `paper_dir[<TAB>images_dir[<TAB>paper_id]]`. Blank lines and # comments are ignored.
+    """
+    papers: List[PaperSpec] = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            row = json.loads(line)
+            paper_dir = Path(row["paper_dir"])
+            images_dir = Path(row["images_dir"]) if row.get("images_dir") else paper_dir / images_subdir
+            paper_id = row.get("paper_id") or paper_dir.name
+        else:
+            parts = line.split("\t")
+            paper_dir = Path(parts[0])
+            images_dir = Path(parts[1]) if len(parts) > 1 and parts[1] else paper_dir / images_subdir
+            paper_id = parts[2] if len(parts) > 2 and parts[2] else paper_dir.name
+        papers.append(PaperSpec(paper_id=paper_id, paper_dir=paper_dir, images_dir=images_dir))
+    return papers
+
+
+class ProgressJournal:
+    """
+    Append-only JSONL log of finished images. Each record is flushed and
+    fsynced, so after a crash a rerun skips everything already written.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._done: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    # torn last line from a crash
+                    continue
+                if rec.get("outcome") in {"done", "skipped"}:
+                    self._done.add((rec.get("paper_id"), rec.get("image")))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def is_done(self, paper_id: str, image: str) -> bool:
+        with self._lock:
+            return (paper_id, image) in self._done
+
+    def record(self, paper_id: str, image: str, outcome: str, error: Optional[str] = None) -> None:
+        rec = {"paper_id": paper_id, "image": image, "outcome": outcome}
+        if error:
+            rec["error"] = error
+        with self._lock:
+            if outcome in {"done", "skipped"}:
+                self._done.add((paper_id, image))
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+def run_corpus(
+    papers: Iterable[PaperSpec],
+    client,
+    model: str,
+    example_text: str,
+    out_dir: Path,
+    journal: ProgressJournal,
+    concurrency: int = 4,
+    context_workers: int = 2,
+    timeout: Optional[float] = None,
+    max_retries: int = 0,
+    use_context_cache: bool = True,
+    var_match_min_score: Optional[float] = None,
+) -> BatchStats:
+    """
+    Build paper contexts on `context_workers` threads and feed their images to
+    one shared LLM pool. A paper thread blocks once 2x`concurrency` images are
+    queued, which bounds both queued work and the number of live contexts.
+    """
+    stats = BatchStats()
+    slots = threading.BoundedSemaphore(max(1, concurrency) * 2)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as llm_pool:
+
+        def finish(job: ImageJob, fut) -> None:
+            try:
+                outcome, error = fut.result(), None
+            except Exception as e:
+                outcome, error = "failed", str(e)
+                print(f"failed on {job.img}: {e}")
+            stats.record(f"{job.paper_id}/{job.img.name}", outcome, error)
+            journal.record(job.paper_id, job.img.name, outcome, error)
+            slots.release()
+
+        def run_paper(spec: PaperSpec) -> None:
+            images = []
+            for img in discover_images(spec.images_dir):
+                if journal.is_done(spec.paper_id, img.name):
+                    stats.add_total(1)
+                    stats.record(f"{spec.paper_id}/{img.name}", "skipped")
+                else:
+                    images.append(img)
+            if not images:
+                return
+            try:
+                ctx = ContextLoader(spec.paper_dir, use_cache=use_context_cache).build(spec.paper_id)
+            except Exception as e:
+                print(f"failed to build context for {spec.paper_id}: {e}")
+                stats.add_total(len(images))
+                for img in images:
+                    stats.record(f"{spec.paper_id}/{img.name}", "failed", f"context: {e}")
+                    journal.record(spec.paper_id, img.name, "failed", f"context: {e}")
+                return
+            stats.add_total(len(images))
+            paper_out = Path(out_dir) / spec.paper_id
+            for img in images:
+                job = ImageJob(img=img, paper_id=spec.paper_id, out_dir=paper_out, ctx=ctx)
+                slots.acquire()
+                fut = llm_pool.submit(
+                    process_image, job, client, model, example_text, timeout, max_retries, var_match_min_score
+                )
+                fut.add_done_callback(lambda f, job=job: finish(job, f))
+
+        with ThreadPoolExecutor(max_workers=max(1, context_workers)) as ctx_pool:
+            futures = {ctx_pool.submit(run_paper, spec): spec for spec in papers}
+            for fut, spec in futures.items():
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"failed on paper {spec.paper_id}: {e}")
+    return stats
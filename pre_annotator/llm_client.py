@@ -2,13 +2,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
-import base64
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 import json
 import os
+import random
+import time
 
 import openai
 
+from backend.image_cache import get_inline_encoder
+from backend.llm_cache import LLMResponseCache, get_llm_cache, request_key
+
 
 @dataclass
 class LLMConfig:
@@ -39,19 +43,67 @@ def load_config_from_file(path: Path) -> Optional[LLMConfig]:
         return None
 
 
-def client_from_config(cfg: LLMConfig) -> openai.OpenAI:
+def client_from_config(cfg: LLMConfig, max_retries: Optional[int] = None) -> openai.OpenAI:
+    """max_retries=0 disables the SDK's own retries when the caller uses call_with_retry."""
     if not cfg.api_key:
         raise ValueError("Missing OPENAI_API_KEY / PRE_ANNOTATOR_API_KEY")
     kwargs: Dict[str, Any] = {"api_key": cfg.api_key}
     if cfg.base_url:
         kwargs["base_url"] = cfg.base_url
+    if max_retries is not None:
+        kwargs["max_retries"] = max_retries
     return openai.OpenAI(**kwargs)
 
 
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+T = TypeVar("T")
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    max_retries: int = 4,
+    base_delay: float = 2.0,
+    max_delay: float = 60.0,
+) -> T:
+    """
+    Run fn, retrying rate-limit / timeout / connection / 5xx errors with
+    exponential backoff and jitter (or the server's Retry-After if sent).
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except RETRYABLE_ERRORS as exc:
+            if attempt >= max_retries:
+                raise
+            delay = _retry_after(exc)
+            if delay is None:
+                delay = min(max_delay, base_delay * (2 ** attempt)) * (0.5 + random.random() / 2)
+            time.sleep(min(delay, max_delay))
+            attempt += 1
+
+
 def image_to_data_url(path) -> str:
-    with open(path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    return f"data:image/{path.suffix.lstrip('.')};base64,{b64}"
+    """Trimmed, downscaled inline copy of the image (cached by content, see backend/image_cache.py)."""
+    path = Path(path)
+    return get_inline_encoder().data_url(path.read_bytes(), path.name)
 
 
 def parse_llm_json(content: str) -> Dict[str, Any]:
@@ -67,6 +119,11 @@ def parse_llm_json(content: str) -> Dict[str, Any]:
     return json.loads(text)
 
 
+def _ordered(items) -> List[str]:
+    """Lists and tuples keep their (e.g. relevance) order; anything else is sorted."""
+    return list(items) if isinstance(items, (list, tuple)) else sorted(items)
+
+
 def ask_for_grid_and_skeleton(
     client: openai.OpenAI,
     model: str,
@@ -77,17 +134,22 @@ def ask_for_grid_and_skeleton(
     candidate_columns,
     candidate_code_vars,
     example_text: str = "",
+    timeout: Optional[float] = None,
+    max_retries: int = 0,
+    cache: Optional[LLMResponseCache] = None,
 ) -> Dict[str, Any]:
     """
-    Call LLM to return a JSON payload:
+    Call LLM (or reuse a cached answer for identical inputs, see
+    backend/llm_cache.py; `cache` defaults to the process-wide one) to return
+    a JSON payload:
     {
       "grid": [["row_id","c1",...], ...],
       "skeleton": {...}
     }
     """
-    # Keep context concise
-    col_list = list(candidate_columns)[:400]
-    code_list = list(candidate_code_vars)[:400]
+    # Keep context concise; sets are sorted so the prompt (and its cache key) is the same in every run
+    col_list = _ordered(candidate_columns)[:400]
+    code_list = _ordered(candidate_code_vars)[:400]
 
     example_block = """
 Example (table with interactions):
@@ -146,7 +208,20 @@ Expected skeleton (partial):
             ],
         },
     ]
-    resp = client.chat.completions.create(model=model, messages=messages, temperature=0)
+    cache = cache or get_llm_cache()
+    key = request_key(model, messages, base_url=getattr(client, "base_url", None), temperature=0)
+    cached = cache.get(key)
+    if cached is not None:
+        try:
+            return parse_llm_json(cached)
+        except ValueError:
+            pass
+    resp = call_with_retry(
+        lambda: client.chat.completions.create(model=model, messages=messages, temperature=0, timeout=timeout),
+        max_retries=max_retries,
+    )
     content = resp.choices[0].message.content
     # Content expected to be JSON; try to parse
-    return parse_llm_json(content)
+    result = parse_llm_json(content)
+    cache.put(key, content, model)
+    return result
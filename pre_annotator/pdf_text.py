@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def default_cache_dir() -> Path:
+    base = os.getenv("PRE_ANNOTATOR_CACHE_DIR")
+    return Path(base) if base else Path.home() / ".cache" / "econ_table_annotator"
+
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def pdf_digest(path: Path) -> str:
+    """sha1 of the file contents, memoised per (path, size, mtime) for this process."""
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[key] = digest
+    return digest
+
+
+def _page_count(pdf: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(pdf) as doc:
+        return len(doc.pages)
+
+
+def _extract_pages(pdf: str, pages: List[int]) -> Dict[int, str]:
+    import pdfplumber
+
+    out: Dict[int, str] = {}
+    with pdfplumber.open(pdf) as doc:
+        for n in pages:
+            try:
+                out[n] = doc.pages[n].extract_text() or ""
+            except Exception:
+                out[n] = ""
+    return out
+
+
+class PdfTextService:
+    """
+    Page-level pdf text extraction with a persistent cache keyed by
+    (pdf sha1, page number).
+
+    `iter_pages` yields page texts in order and only extracts what the
+    caller consumes: pages are extracted in batches on a process pool, at
+    most `workers` batches ahead of the page being read, and the pending
+    batches are cancelled when the caller stops iterating. With workers=0
+    extraction runs in the calling thread.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, workers: int = 2, batch_size: int = 2) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "pdf_pages"
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _page_dir(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / digest
+
+    def _read_cached(self, page_dir: Path, page: int) -> Optional[str]:
+        try:
+            return (page_dir / f"{page}.txt").read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _write_cached(self, page_dir: Path, page: int, text: str) -> None:
+        target = page_dir / f"{page}.txt"
+        tmp = page_dir / f"{page}.txt.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            page_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, target)
+        except OSError:
+            pass
+
+    def page_count(self, pdf: Path, digest: Optional[str] = None) -> int:
+        page_dir = self._page_dir(digest or pdf_digest(pdf))
+        meta = page_dir / "meta.json"
+        try:
+            return int(json.loads(meta.read_text(encoding="utf-8"))["pages"])
+        except Exception:
+            pass
+        count = _page_count(str(pdf))
+        try:
+            page_dir.mkdir(parents=True, exist_ok=True)
+            meta.write_text(json.dumps({"pages": count, "name": Path(pdf).name}), encoding="utf-8")
+        except OSError:
+            pass
+        return count
+
+    def iter_pages(self, pdf: Path) -> Iterator[str]:
+        digest = pdf_digest(pdf)
+        page_dir = self._page_dir(digest)
+        n_pages = self.page_count(pdf, digest)
+        batches = [list(range(i, min(i + self.batch_size, n_pages))) for i in range(0, n_pages, self.batch_size)]
+        cached: Dict[int, str] = {}
+        pending: Dict[int, Future] = {}
+        scheduled = set()
+
+        def schedule(b: int) -> None:
+            if b >= len(batches) or b in scheduled:
+                return
+            scheduled.add(b)
+            missing = []
+            for page in batches[b]:
+                text = self._read_cached(page_dir, page)
+                if text is None:
+                    missing.append(page)
+                else:
+                    cached[page] = text
+            if missing and self.workers > 0:
+                pending[b] = self._executor().submit(_extract_pages, str(pdf), missing)
+
+        try:
+            for b, pages in enumerate(batches):
+                for ahead in range(b, b + max(1, self.workers) + 1):
+                    schedule(ahead)
+                fut = pending.pop(b, None)
+                extracted = fut.result() if fut is not None else {}
+                missing = [p for p in pages if p not in cached and p not in extracted]
+                if missing:
+                    extracted.update(_extract_pages(str(pdf), missing))
+                for page in pages:
+                    if page in extracted:
+                        self._write_cached(page_dir, page, extracted[page])
+                        yield extracted[page]
+                    else:
+                        yield cached.pop(page)
+        finally:
+            for fut in pending.values():
+                fut.cancel()
+
+    def read_text(self, pdf: Path, limit_chars: int) -> str:
+        """Concatenate pages until more than limit_chars are collected, then truncate."""
+        texts: List[str] = []
+        total = 0
+        with closing(self.iter_pages(pdf)) as pages:
+            for text in pages:
+                texts.append(text)
+                total += len(text)
+                if total > limit_chars:
+                    break
+        return "\n".join(texts)[:limit_chars]
+
+
+_service: Optional[PdfTextService] = None
+_service_lock = threading.Lock()
+
+
+def get_pdf_service(workers: Optional[int] = None, cache_dir: Optional[Path] = None) -> PdfTextService:
+    """Process-wide service; the first call (or one passing arguments) configures it."""
+    global _service
+    with _service_lock:
+        if _service is None or workers is not None or cache_dir is not None:
+            if _service is not None:
+                _service.close()
+            _service = PdfTextService(cache_dir=cache_dir, workers=2 if workers is None else workers)
+        return _service
@@ -2,10 +2,20 @@ from __future__ import annotations
 
 import argparse
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Collection, Dict, List, Optional, Tuple
 
-from .context_loader import ContextLoader, discover_images, default_table_id
+from backend.file_utils import atomic_write_text, csv_text
+from backend.image_cache import get_inline_encoder
+from backend.llm_cache import get_llm_cache
+from backend.var_matcher import VarMatcher, get_matcher
+
+from .context_loader import ContextLoader, ProjectContext, discover_images, default_table_id
+from .pdf_text import get_pdf_service
 from .llm_client import ask_for_grid_and_skeleton, client_from_config, load_config_from_env, load_config_from_file
 
 
@@ -14,19 +24,13 @@ def ensure_dir(p: Path) -> None:
 
 
 def write_csv(path: Path, rows: List[List[str]]) -> None:
-    import csv
-
     ensure_dir(path.parent)
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        for r in rows:
-            writer.writerow(r)
+    atomic_write_text(path, csv_text(rows))
 
 
 def write_json(path: Path, data: Dict) -> None:
     ensure_dir(path.parent)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
 
 
 def load_examples(example_dir: Path, limit_pairs: int = 3) -> str:
@@ -62,87 +66,333 @@ def load_examples(example_dir: Path, limit_pairs: int = 3) -> str:
     return "\n".join(pairs)
 
 
+# (section, label field, name field) of the skeleton entries that carry a data variable
+VAR_FIELDS = [
+    ("y_columns", "depvar_label", "depvar_data_name"),
+    ("x_rows", "display_label", "data_var_name"),
+    ("fe_rows", "label", "data_var_name"),
+]
+
+
+def check_var_names(
+    skeleton: Dict[str, Any], matcher: VarMatcher, min_score: float = 0.6, code_vars: Collection[str] = ()
+) -> int:
+    """
+    Fill blank / "unknown" data variable names with the local best match
+    scoring at least min_score, and note names the LLM chose that are
+    neither dataset columns nor code variables. Returns how many names
+    were filled.
+    """
+    entries = [
+        (item, label_field, name_field)
+        for section, label_field, name_field in VAR_FIELDS
+        for item in skeleton.get(section) or []
+        if isinstance(item, dict)
+    ]
+    if not entries:
+        return 0
+    known = set(matcher.columns) | set(code_vars)
+    matches = matcher.match([str(item.get(label) or "") for item, label, _ in entries], k=1)
+    filled = 0
+    for (item, _, name_field), candidates in zip(entries, matches):
+        best = candidates[0] if candidates else None
+        current = (item.get(name_field) or "").strip()
+        if current and current != "unknown":
+            if current not in known and best:
+                note = f"not a dataset column or code variable; closest: {best[0]} ({best[1]:.2f})"
+                item["note"] = f"{item['note']}; {note}" if item.get("note") else note
+        elif best and best[1] >= min_score:
+            item[name_field] = best[0]
+            note = f"local match ({best[1]:.2f})"
+            item["note"] = f"{item['note']}; {note}" if item.get("note") else note
+            filled += 1
+    return filled
+
+
+def write_result(
+    result: Dict[str, Any],
+    paper_id: str,
+    table_id: str,
+    img: Path,
+    out_dir: Path,
+    matcher: Optional[VarMatcher] = None,
+    min_score: float = 0.6,
+    code_vars: Collection[str] = (),
+) -> None:
+    csv_path = out_dir / f"{paper_id}_{table_id}.csv"
+    sk_path = out_dir / f"{paper_id}_{table_id}.skeleton.json"
+    panels = result.get("panels")
+    if panels and isinstance(panels, list):
+        for idx, panel in enumerate(panels):
+            panel_id = panel.get("panel_id") or panel.get("id") or chr(ord("A") + idx)
+            p_csv = out_dir / f"{paper_id}_{table_id}_{panel_id}.csv"
+            p_sk = out_dir / f"{paper_id}_{table_id}_{panel_id}.skeleton.json"
+            grid = panel.get("grid") or panel.get("rows") or []
+            skeleton = panel.get("skeleton") or {}
+            skeleton.setdefault("paper_id", paper_id)
+            skeleton.setdefault("table_id", f"{table_id}_{panel_id}")
+            skeleton.setdefault("panel_id", panel_id)
+            skeleton.setdefault("grid_file", p_csv.name)
+            skeleton.setdefault("image_file", img.name)
+            skeleton.setdefault("status", "in_progress")
+            skeleton.setdefault("bracket_type_default", skeleton.get("bracket_type_default", "unknown"))
+            if matcher is not None:
+                check_var_names(skeleton, matcher, min_score, code_vars)
+            write_csv(p_csv, grid)
+            write_json(p_sk, skeleton)
+    else:
+        grid = result.get("grid") or result.get("rows") or []
+        skeleton = result.get("skeleton") or {}
+        skeleton.setdefault("paper_id", paper_id)
+        skeleton.setdefault("table_id", table_id)
+        skeleton.setdefault("grid_file", csv_path.name)
+        skeleton.setdefault("image_file", img.name)
+        skeleton.setdefault("status", "in_progress")
+        skeleton.setdefault("bracket_type_default", skeleton.get("bracket_type_default", "unknown"))
+        if matcher is not None:
+            check_var_names(skeleton, matcher, min_score, code_vars)
+        write_csv(csv_path, grid)
+        write_json(sk_path, skeleton)
+
+
+@dataclass
+class ImageJob:
+    img: Path
+    paper_id: str
+    out_dir: Path
+    ctx: ProjectContext
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    done: int = 0
+    skipped: int = 0
+    failed: int = 0
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_total(self, n: int) -> None:
+        with self._lock:
+            self.total += n
+
+    def record(self, name: str, outcome: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            if outcome == "done":
+                self.done += 1
+            elif outcome == "skipped":
+                self.skipped += 1
+            else:
+                self.failed += 1
+                self.failures.append((name, error or ""))
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        lines = [
+            f"{self.total} images: {self.done} done, {self.skipped} skipped, {self.failed} failed "
+            f"in {elapsed:.1f}s ({self.done / elapsed * 60:.1f} tables/min)"
+        ]
+        for name, error in self.failures:
+            lines.append(f"  failed {name}: {error}")
+        return "\n".join(lines)
+
+
+def llm_cache_summary(cache) -> str:
+    s = cache.stats()
+    if not s["enabled"]:
+        return "llm cache: off"
+    return f"llm cache: {s['hits']} hits, {s['misses']} misses, {s['stored']} stored ({s['dir']})"
+
+
+def process_image(
+    job: ImageJob,
+    client,
+    model: str,
+    example_text: str,
+    timeout: Optional[float] = None,
+    max_retries: int = 0,
+    var_match_min_score: Optional[float] = None,
+) -> str:
+    """
+    Run one image through the LLM and write its outputs. Returns "done" or "skipped".
+    With var_match_min_score set, data variable names are checked / filled
+    against the dataset columns by the local matcher (check_var_names).
+    """
+    table_id = default_table_id(job.img)
+    csv_path = job.out_dir / f"{job.paper_id}_{table_id}.csv"
+    sk_path = job.out_dir / f"{job.paper_id}_{table_id}.skeleton.json"
+    if csv_path.exists() and sk_path.exists():
+        print(f"skip {job.img.name}, outputs exist")
+        return "skipped"
+    print(f"processing {job.img.name} -> {csv_path.name}")
+    result = ask_for_grid_and_skeleton(
+        client=client,
+        model=model,
+        image_path=job.img,
+        paper_id=job.paper_id,
+        table_id=table_id,
+        code_text=job.ctx.code_text,
+        candidate_columns=job.ctx.candidate_columns,
+        candidate_code_vars=job.ctx.candidate_code_vars,
+        example_text=example_text,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+    matcher = None
+    if var_match_min_score is not None and job.ctx.candidate_columns:
+        matcher = get_matcher(sorted(job.ctx.candidate_columns), job.ctx.var_abbreviations)
+    write_result(
+        result, job.paper_id, table_id, job.img, job.out_dir, matcher, var_match_min_score or 0.0, job.ctx.candidate_code_vars
+    )
+    return "done"
+
+
+def run_jobs(
+    jobs: List[ImageJob],
+    client,
+    model: str,
+    example_text: str,
+    concurrency: int = 1,
+    timeout: Optional[float] = None,
+    max_retries: int = 0,
+    stats: Optional[BatchStats] = None,
+    var_match_min_score: Optional[float] = None,
+) -> BatchStats:
+    """Process jobs on a thread pool; at most `concurrency` LLM calls are in flight."""
+    stats = stats or BatchStats()
+    stats.add_total(len(jobs))
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(
+                process_image, job, client, model, example_text, timeout, max_retries, var_match_min_score
+            ): job
+            for job in jobs
+        }
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                stats.record(job.img.name, fut.result())
+            except Exception as e:
+                print(f"failed on {job.img}: {e}")
+                stats.record(job.img.name, "failed", str(e))
+    return stats
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Pre-annotator: LLM converts table images to CSV + skeleton with data_var_name.")
-    parser.add_argument("--paper-dir", required=True, help="Path to project root (contains pdf/data/code). Example: D:\\Data\\...\\mnsc_2023_03369")
-    parser.add_argument("--images-dir", required=True, help="Directory of table images (png/jpg).")
+    parser.add_argument("--paper-dir", required=False, help="Path to project root (contains pdf/data/code). Example: D:\\Data\\...\\mnsc_2023_03369")
+    parser.add_argument("--images-dir", required=False, help="Directory of table images (png/jpg).")
     parser.add_argument("--output-dir", required=True, help="Where to write csv/skeleton outputs.")
     parser.add_argument("--paper-id", required=False, help="Paper id (default from folder name).")
     parser.add_argument("--model", default=None, help="Override LLM model (default env PRE_ANNOTATOR_MODEL or gpt-4o).")
     parser.add_argument("--examples-dir", default="sample_data", help="Directory containing reference csv+skeleton to show the LLM expected format.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Maximum number of LLM requests in flight.")
+    parser.add_argument("--timeout", type=float, default=180.0, help="Per-request LLM timeout in seconds.")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retries with backoff on rate-limit/timeout/5xx errors.")
+    parser.add_argument("--no-context-cache", action="store_true", help="Ignore and do not write <paper-dir>/.pre_annotator_cache.")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Always call the LLM and do not store its answers.")
+    parser.add_argument("--llm-cache-dir", default=None, help="LLM response cache (default ~/.cache/econ_table_annotator/llm_responses).")
+    parser.add_argument("--llm-cache-max-mb", type=float, default=256, help="Size limit of the LLM response cache.")
+    parser.add_argument("--image-max-edge", type=int, default=2048, help="Longest edge (px) of images sent to the LLM.")
+    parser.add_argument("--image-max-kb", type=int, default=1024, help="Encoded size budget of images sent to the LLM.")
+    parser.add_argument(
+        "--var-match-min-score",
+        type=float,
+        default=None,
+        help="Fill blank data_var_name with the local best-matching dataset column at or above this score and note names that are neither columns nor code variables (default off).",
+    )
+    parser.add_argument("--pdf-workers", type=int, default=2, help="Processes extracting pdf pages ahead of the reader (0 = inline).")
+    corpus = parser.add_argument_group("corpus mode (instead of --paper-dir/--images-dir)")
+    corpus.add_argument("--corpus-root", default=None, help="Directory whose sub-directories are paper dirs.")
+    corpus.add_argument("--manifest", default=None, help="File listing paper dirs (JSON lines or paper_dir<TAB>images_dir<TAB>paper_id).")
+    corpus.add_argument("--images-subdir", default="images", help="Images folder inside each paper dir.")
+    corpus.add_argument("--images-root", default=None, help="Alternative: images for paper X live in <images-root>/X.")
+    corpus.add_argument("--context-workers", type=int, default=2, help="Papers whose context is built in parallel.")
+    corpus.add_argument("--journal", default=None, help="Progress journal (default <output-dir>/.pipeline_journal.jsonl).")
     args = parser.parse_args()
+    get_pdf_service(workers=args.pdf_workers)
+    get_inline_encoder(max_edge=args.image_max_edge, max_bytes=args.image_max_kb * 1024)
+    llm_cache = get_llm_cache(
+        cache_dir=Path(args.llm_cache_dir) if args.llm_cache_dir else None,
+        max_bytes=int(args.llm_cache_max_mb * 1024 * 1024),
+        enabled=not args.no_llm_cache,
+    )
 
-    paper_dir = Path(args.paper_dir)
-    images_dir = Path(args.images_dir)
-    out_dir = Path(args.output_dir)
-    paper_id = args.paper_id or paper_dir.name
+    corpus_mode = bool(args.corpus_root or args.manifest)
+    if not corpus_mode and not (args.paper_dir and args.images_dir):
+        parser.error("--paper-dir and --images-dir are required unless --corpus-root or --manifest is given")
 
-    ctx_loader = ContextLoader(paper_dir)
-    ctx = ctx_loader.build(paper_id)
+    out_dir = Path(args.output_dir)
 
     # Load API config: prefer config.local.json in pre_annotator or --output-dir dir, then env
     cfg = load_config_from_file(Path("pre_annotator/config.local.json")) or load_config_from_env()
     if args.model:
         cfg.model = args.model
-    client = client_from_config(cfg)
+    # retries are handled per request by call_with_retry
+    client = client_from_config(cfg, max_retries=0)
 
     example_text = load_examples(Path(args.examples_dir))
 
+    if corpus_mode:
+        from .corpus import ProgressJournal, discover_papers, read_manifest, run_corpus
+
+        if args.manifest:
+            papers = read_manifest(Path(args.manifest), images_subdir=args.images_subdir)
+        else:
+            images_root = Path(args.images_root) if args.images_root else None
+            papers = discover_papers(Path(args.corpus_root), images_subdir=args.images_subdir, images_root=images_root)
+        if not papers:
+            print("No papers found.")
+            return
+        journal = ProgressJournal(Path(args.journal) if args.journal else out_dir / ".pipeline_journal.jsonl")
+        try:
+            stats = run_corpus(
+                papers,
+                client,
+                cfg.model,
+                example_text,
+                out_dir,
+                journal,
+                concurrency=args.concurrency,
+                context_workers=args.context_workers,
+                use_context_cache=not args.no_context_cache,
+                timeout=args.timeout,
+                max_retries=args.max_retries,
+                var_match_min_score=args.var_match_min_score,
+            )
+        finally:
+            journal.close()
+        print(f"{len(papers)} papers")
+        print(stats.summary())
+        print(llm_cache_summary(llm_cache))
+        return
+
+    paper_dir = Path(args.paper_dir)
+    images_dir = Path(args.images_dir)
+    paper_id = args.paper_id or paper_dir.name
+
+    ctx_loader = ContextLoader(paper_dir, use_cache=not args.no_context_cache)
+    ctx = ctx_loader.build(paper_id)
+
     images = discover_images(images_dir)
     if not images:
         print("No images found.")
         return
 
-    for img in images:
-        table_id = default_table_id(img)
-        csv_path = out_dir / f"{paper_id}_{table_id}.csv"
-        sk_path = out_dir / f"{paper_id}_{table_id}.skeleton.json"
-        if csv_path.exists() and sk_path.exists():
-            print(f"skip {img.name}, outputs exist")
-            continue
-        print(f"processing {img.name} -> {csv_path.name}")
-        try:
-            result = ask_for_grid_and_skeleton(
-                client=client,
-                model=cfg.model,
-                image_path=img,
-                paper_id=paper_id,
-                table_id=table_id,
-                code_text=ctx.code_text,
-                candidate_columns=ctx.candidate_columns,
-                candidate_code_vars=ctx.candidate_code_vars,
-                example_text=example_text,
-            )
-            panels = result.get("panels")
-            if panels and isinstance(panels, list):
-                for idx, panel in enumerate(panels):
-                    panel_id = panel.get("panel_id") or panel.get("id") or chr(ord("A") + idx)
-                    p_csv = out_dir / f"{paper_id}_{table_id}_{panel_id}.csv"
-                    p_sk = out_dir / f"{paper_id}_{table_id}_{panel_id}.skeleton.json"
-                    grid = panel.get("grid") or panel.get("rows") or []
-                    skeleton = panel.get("skeleton") or {}
-                    skeleton.setdefault("paper_id", paper_id)
-                    skeleton.setdefault("table_id", f"{table_id}_{panel_id}")
-                    skeleton.setdefault("panel_id", panel_id)
-                    skeleton.setdefault("grid_file", p_csv.name)
-                    skeleton.setdefault("image_file", img.name)
-                    skeleton.setdefault("status", "in_progress")
-                    skeleton.setdefault("bracket_type_default", skeleton.get("bracket_type_default", "unknown"))
-                    write_csv(p_csv, grid)
-                    write_json(p_sk, skeleton)
-            else:
-                grid = result.get("grid") or result.get("rows") or []
-                skeleton = result.get("skeleton") or {}
-                skeleton.setdefault("paper_id", paper_id)
-                skeleton.setdefault("table_id", table_id)
-                skeleton.setdefault("grid_file", csv_path.name)
-                skeleton.setdefault("image_file", img.name)
-                skeleton.setdefault("status", "in_progress")
-                skeleton.setdefault("bracket_type_default", skeleton.get("bracket_type_default", "unknown"))
-                write_csv(csv_path, grid)
-                write_json(sk_path, skeleton)
-        except Exception as e:
-            print(f"failed on {img}: {e}")
+    jobs = [ImageJob(img=img, paper_id=paper_id, out_dir=out_dir, ctx=ctx) for img in images]
+    stats = run_jobs(
+        jobs,
+        client,
+        cfg.model,
+        example_text,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        var_match_min_score=args.var_match_min_score,
+    )
+    print(stats.summary())
+    print(llm_cache_summary(llm_cache))
 
 
 if __name__ == "__main__":